@@ -0,0 +1,64 @@
+"""Decode cost per search page and encode cost per push body for each JSON codec
+
+Run from the repository root: python -m benchmarks.bench_json
+"""
+
+from typing import Any, List
+
+import argparse
+import json
+import timeit
+
+import pyszuru
+from benchmarks.stub_server import _Booru
+from pyszuru.codec import msgspec
+
+
+def _page(num_posts: int, tags_per_post: int) -> bytes:
+    booru = _Booru(num_posts=num_posts, num_tags=tags_per_post * 2)
+    for post in booru.posts.values():
+        booru.set_post_tags(post, [f"tag_{i}" for i in range(tags_per_post)])
+    results = list(booru.posts.values())
+    page = {"query": "", "offset": 0, "limit": num_posts, "total": 1000, "results": results}
+    return json.dumps(page).encode("utf-8")
+
+
+def _typed_decoder():
+    # Typed decoding of the lazy load fields only, for comparison with plain decoding
+    fields = pyszuru.Post._lazy_load_components()
+    item = msgspec.defstruct("Item", [(x, Any, msgspec.UNSET) for x in fields])
+    page = msgspec.defstruct("Page", [("results", List[item]), ("total", int, 0)])
+    return msgspec.json.Decoder(page).decode
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--number", type=int, default=200)
+    parser.add_argument("--posts", type=int, default=100)
+    parser.add_argument("--tags", type=int, default=30)
+    args = parser.parse_args()
+
+    page = _page(args.posts, args.tags)
+    body = {"version": 3, "tags": [f"tag_{i}" for i in range(args.tags)], "safety": "safe"}
+    print(f"page of {args.posts} posts: {len(page) / 1024:.1f} KiB")
+    codecs = [pyszuru.JSONCodec()]
+    for codec_class in (pyszuru.OrjsonCodec, pyszuru.MsgspecCodec):
+        try:
+            codecs.append(codec_class())
+        except ImportError:
+            print(f"{codec_class.name}: not installed")
+    for codec in codecs:
+        decode = timeit.timeit(lambda: codec.loads(page), number=args.number)
+        encode = timeit.timeit(lambda: codec.dumps(body), number=args.number * 10)
+        print(
+            f"{codec.name:16} decode {decode / args.number * 1e3:8.3f} ms/page  "
+            f"encode {encode / args.number / 10 * 1e6:8.2f} us/body"
+        )
+    if msgspec is not None:
+        decode = _typed_decoder()
+        seconds = timeit.timeit(lambda: decode(page), number=args.number)
+        print(f"{'msgspec typed':16} decode {seconds / args.number * 1e3:8.3f} ms/page")
+
+
+if __name__ == "__main__":
+    main()
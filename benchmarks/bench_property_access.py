@@ -0,0 +1,81 @@
+"""Microbenchmarks for property access on Post, Tag and Pool
+
+Run from the repository root: python -m benchmarks.bench_property_access
+"""
+
+import argparse
+import timeit
+
+import pyszuru
+
+
+def _tag_json(i: int):
+    return {"names": [f"tag_{i}"], "category": "default", "usages": i}
+
+
+def _post_json(i: int, num_tags: int):
+    return {
+        "id": i,
+        "version": 1,
+        "safety": "safe",
+        "type": "image",
+        "contentUrl": f"data/posts/{i}.png",
+        "flags": ["loop"],
+        "tags": [_tag_json(j) for j in range(num_tags)],
+        "relations": [{"id": j} for j in range(5)],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--number", type=int, default=2000)
+    parser.add_argument("--tags", type=int, default=30)
+    args = parser.parse_args()
+
+    api = pyszuru.API("http://127.0.0.1", resolve_tag_names=False)
+    post = pyszuru.Post(api, _post_json(1, args.tags))
+    tag = pyszuru.Tag(
+        api,
+        {
+            **_tag_json(0),
+            "implications": [_tag_json(j) for j in range(args.tags)],
+            "suggestions": [],
+        },
+    )
+    pool = pyszuru.Pool(
+        api,
+        {
+            "id": 1,
+            "names": ["pool"],
+            "category": "default",
+            "posts": [{"id": j} for j in range(args.tags)],
+        },
+    )
+
+    def append_tags():
+        fresh = pyszuru.Post(api, _post_json(2, args.tags))
+        tags = fresh.tags
+        for i in range(args.tags):
+            tags.append(f"new_{i}")
+        return fresh.tags
+
+    cases = {
+        "post.safety": lambda: post.safety,
+        "post.loop": lambda: post.loop,
+        "len(post.tags)": lambda: len(post.tags),
+        "list(post.tags)": lambda: list(post.tags),
+        "post.tags[0]": lambda: post.tags[0],
+        "[str(t) for t in post.tags]": lambda: [str(t) for t in post.tags],
+        "list(post.relations)": lambda: list(post.relations),
+        "list(tag.implications)": lambda: list(tag.implications),
+        "tag.primary_name": lambda: tag.primary_name,
+        "list(pool.posts)": lambda: list(pool.posts),
+        "append to post.tags": append_tags,
+    }
+    for name, fn in cases.items():
+        seconds = timeit.timeit(fn, number=args.number)
+        print(f"{name:30} {seconds / args.number * 1e6:10.2f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""Memory per search result for Post objects vs. compact PostRecords
+
+Run from the repository root: python -m benchmarks.bench_record_memory
+"""
+
+import argparse
+import tracemalloc
+
+import pyszuru
+from benchmarks.stub_server import base_url, serve
+
+
+def _measure(fn) -> int:
+    tracemalloc.start()
+    try:
+        results = fn()
+        size = tracemalloc.get_traced_memory()[0]
+        del results
+        return size
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--posts", type=int, default=20000)
+    parser.add_argument("--tags", type=int, default=500)
+    args = parser.parse_args()
+
+    server = serve(num_posts=args.posts, num_tags=args.tags)
+    api = pyszuru.API(base_url(server))
+
+    full = _measure(lambda: list(api.search_post("", page_size=100)))
+    compact = _measure(lambda: list(api.search_post("", page_size=100, compact=True)))
+    print(f"Post:       {full / args.posts:8.1f} bytes/result")
+    print(f"PostRecord: {compact / args.posts:8.1f} bytes/result")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""Calls/sec of API._call with a pooled session vs. a fresh connection per call
+
+Run from the repository root: python -m benchmarks.bench_session
+"""
+
+import argparse
+import time
+
+import requests
+
+import pyszuru
+from benchmarks.stub_server import base_url, serve
+
+
+def _bench(fn, count: int) -> float:
+    start = time.perf_counter()
+    for _ in range(count):
+        fn()
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=2000)
+    args = parser.parse_args()
+
+    server = serve(num_posts=1)
+    url = base_url(server)
+
+    with pyszuru.API(url) as api:
+        api._call("GET", ["post", 1])
+        pooled = _bench(lambda: api._call("GET", ["post", 1]), args.calls)
+
+    api = pyszuru.API(url)
+    api_url = api._create_api_url(["post", 1])
+    fresh = _bench(
+        lambda: requests.request("GET", api_url, headers=api._api_headers).json(),
+        args.calls,
+    )
+
+    print(f"pooled session:   {pooled:10.1f} calls/s")
+    print(f"fresh connection: {fresh:10.1f} calls/s")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
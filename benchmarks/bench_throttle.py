@@ -0,0 +1,55 @@
+"""Fetching posts from many threads against a server of limited capacity, with and
+without the adaptive concurrency controller
+
+Run from the repository root: python -m benchmarks.bench_throttle
+"""
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pyszuru
+from benchmarks.stub_server import base_url, serve
+
+
+def _run(url: str, requests: int, threads: int, concurrency=None):
+    api = pyszuru.API(url, pool_maxsize=threads, concurrency=concurrency)
+
+    def fetch(i: int) -> bool:
+        try:
+            api.getPost(i % 100 + 1)
+            return True
+        except pyszuru.SzurubooruHTTPError:
+            return False
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        succeeded = sum(executor.map(fetch, range(requests)))
+    elapsed = time.monotonic() - started
+    api.close()
+    return succeeded, requests - succeeded, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--capacity", type=int, default=8)
+    parser.add_argument("--service-time", type=float, default=0.005)
+    args = parser.parse_args()
+
+    server = serve(num_posts=100, capacity=args.capacity, service_time=args.service_time)
+    url = base_url(server)
+    controller = pyszuru.AdaptiveConcurrency(initial=4, maximum=args.threads)
+    for name, concurrency in (("unthrottled", None), ("adaptive", controller)):
+        succeeded, failed, elapsed = _run(url, args.requests, args.threads, concurrency)
+        print(
+            f"{name:12} {succeeded / elapsed:8.1f} ok/s  {failed:6} errors  "
+            f"{elapsed:6.2f} s"
+        )
+    print(f"final adaptive limit: {controller.limit}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
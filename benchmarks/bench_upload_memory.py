@@ -0,0 +1,57 @@
+"""Peak Python memory of API.upload_file with the streaming encoder vs. files=
+
+Run from the repository root: python -m benchmarks.bench_upload_memory
+"""
+
+import argparse
+import os
+import tempfile
+import tracemalloc
+
+import pyszuru
+from benchmarks.stub_server import base_url, serve
+
+
+def _peak(fn) -> int:
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[16, 64, 256], help="MB")
+    args = parser.parse_args()
+
+    server = serve()
+    api = pyszuru.API(base_url(server))
+
+    def buffered(path):
+        with open(path, "rb") as f:
+            response = api._session.post(
+                api._create_api_url(["uploads"]),
+                files={"content": f},
+                headers=api._api_headers,
+            )
+            api._check_api_response(response)
+
+    print(f"{'file size':>10} {'streaming':>12} {'files=':>12}")
+    for size_mb in args.sizes:
+        with tempfile.NamedTemporaryFile(delete=False) as f:
+            chunk = os.urandom(1 << 20)
+            for _ in range(size_mb):
+                f.write(chunk)
+        try:
+            streaming = _peak(lambda: api.upload_file(f.name))
+            multipart = _peak(lambda: buffered(f.name))
+        finally:
+            os.unlink(f.name)
+        print(f"{size_mb:>8}MB {streaming / 2**20:>10.2f}MB {multipart / 2**20:>10.2f}MB")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
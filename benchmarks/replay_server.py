@@ -0,0 +1,199 @@
+"""Replays recorded API traffic, with configurable latency and error injection
+
+A fixture is a JSON file holding recorded exchanges, written by Recorder. Requests are
+matched on method, path and query string; repeated requests get the recorded responses
+for that key in order, starting over once they run out. Request bodies are ignored.
+
+Run from the repository root:
+python -m benchmarks.replay_server benchmarks/fixtures/default.json --latency 0.002
+"""
+
+import argparse
+import json
+import random
+import socket
+import sys
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pyszuru
+
+
+def _key(method: str, url: str) -> str:
+    parsed = urllib.parse.urlsplit(url)
+    query = urllib.parse.urlencode(sorted(urllib.parse.parse_qsl(parsed.query)))
+    return f"{method} {parsed.path}?{query}"
+
+
+class Recorder:
+    """
+    Records the JSON responses received by an API instance:
+
+        recorder = Recorder(api)
+        ...  # use api
+        recorder.save("fixture.json")
+    """
+
+    def __init__(self, api: pyszuru.API):
+        self.exchanges = []
+        self._lock = threading.Lock()
+        api._session.hooks["response"].append(self._on_response)
+
+    def _on_response(self, response, *args, **kwargs):
+        if "json" not in response.headers.get("Content-Type", ""):
+            return
+        with self._lock:
+            self.exchanges.append(
+                {
+                    "key": _key(response.request.method, response.request.url),
+                    "status": response.status_code,
+                    "body": response.json(),
+                }
+            )
+
+    def save(self, path: str) -> None:
+        with open(path, "w") as f:
+            json.dump({"exchanges": self.exchanges}, f, separators=(",", ":"))
+
+
+class _ReplayHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    responses = None
+    positions = None
+    lock = None
+    rng = None
+    latency = 0.0
+    jitter = 0.0
+    error_rate = 0.0
+    error_statuses = (503,)
+    drop_rate = 0.0
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status: int, payload) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _consume_body(self) -> None:
+        remaining = int(self.headers.get("Content-Length") or 0)
+        while remaining:
+            remaining -= len(self.rfile.read(min(remaining, 1 << 16)))
+
+    def _replay(self, method: str) -> None:
+        self._consume_body()
+        key = _key(method, self.path)
+        with self.lock:
+            delay = self.latency + self.rng.uniform(0, self.jitter)
+            fault = self.rng.random()
+            recorded = self.responses.get(key)
+            if recorded:
+                position = self.positions.get(key, 0)
+                self.positions[key] = position + 1
+                exchange = recorded[position % len(recorded)]
+        time.sleep(delay)
+        if fault < self.drop_rate:
+            self.close_connection = True
+            self.connection.shutdown(socket.SHUT_RDWR)
+            return
+        if fault < self.drop_rate + self.error_rate:
+            return self._send(
+                self.rng.choice(self.error_statuses),
+                {"name": "InjectedError", "description": "Injected by the replay server"},
+            )
+        if not recorded:
+            return self._send(
+                404, {"name": "NotFoundError", "description": f"Not recorded: {key}"}
+            )
+        self._send(exchange["status"], exchange["body"])
+
+    def do_GET(self):
+        self._replay("GET")
+
+    def do_POST(self):
+        self._replay("POST")
+
+    def do_PUT(self):
+        self._replay("PUT")
+
+    def do_DELETE(self):
+        self._replay("DELETE")
+
+
+def serve(
+    fixture_path: str,
+    port: int = 0,
+    latency: float = 0.0,
+    jitter: float = 0.0,
+    error_rate: float = 0.0,
+    error_statuses=(503,),
+    drop_rate: float = 0.0,
+    seed: int = 0,
+) -> ThreadingHTTPServer:
+    with open(fixture_path) as f:
+        exchanges = json.load(f)["exchanges"]
+    responses = {}
+    for exchange in exchanges:
+        responses.setdefault(exchange["key"], []).append(exchange)
+    handler = type(
+        "ReplayHandler",
+        (_ReplayHandler,),
+        {
+            "responses": responses,
+            "positions": {},
+            "lock": threading.Lock(),
+            "rng": random.Random(seed),
+            "latency": latency,
+            "jitter": jitter,
+            "error_rate": error_rate,
+            "error_statuses": tuple(error_statuses),
+            "drop_rate": drop_rate,
+        },
+    )
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("fixture")
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per request")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, action="append", dest="error_statuses")
+    parser.add_argument("--drop-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server = serve(
+        args.fixture,
+        args.port,
+        args.latency,
+        args.jitter,
+        args.error_rate,
+        args.error_statuses or (503,),
+        args.drop_rate,
+        args.seed,
+    )
+    # The first line of output is the URL, so that parent processes can connect
+    print(f"http://127.0.0.1:{server.server_address[1]}", flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,471 @@
+import hashlib
+import json
+import re
+import threading
+import time
+import urllib.parse
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _Booru:
+    def __init__(self, num_posts: int = 0, num_tags: int = 0):
+        self.lock = threading.Lock()
+        self.tag_categories = [{"name": "default", "default": True, "version": 1}]
+        self.pool_categories = [{"name": "default", "default": True, "version": 1}]
+        self.tags = {}
+        self.posts = {}
+        self.pools = {}
+        self.uploads = {}
+        self.upload_checksums = {}
+        self.snapshots = []
+        for i in range(num_tags):
+            self.add_tag(f"tag_{i}")
+        for i in range(1, num_posts + 1):
+            self.add_post(
+                [f"tag_{j % max(num_tags, 1)}" for j in range(i, i + 5)] if num_tags else []
+            )
+
+    def add_tag(self, name: str, category: str = "default"):
+        tag = {
+            "names": [name],
+            "category": category,
+            "version": 1,
+            "description": None,
+            "implications": [],
+            "suggestions": [],
+            "usages": 0,
+        }
+        self.tags[name] = tag
+        self.add_snapshot("created", "tag", name)
+        return tag
+
+    def add_pool(self, name: str, category: str = "default", post_ids=()):
+        id_ = len(self.pools) + 1
+        pool = {
+            "id": id_,
+            "version": 1,
+            "names": [name],
+            "category": category,
+            "description": None,
+            "posts": [],
+            "postCount": 0,
+        }
+        self.pools[id_] = pool
+        self.set_pool_posts(pool, post_ids)
+        self.add_snapshot("created", "pool", id_)
+        return pool
+
+    def set_pool_posts(self, pool, post_ids):
+        pool["posts"] = [{"id": x} for x in post_ids if x in self.posts]
+        pool["postCount"] = len(pool["posts"])
+
+    def merge_tags(self, remove, merge_to):
+        for key, tag in list(self.tags.items()):
+            if tag is remove:
+                del self.tags[key]
+        for post in self.posts.values():
+            names = [x["names"][0] for x in post["tags"]]
+            if remove["names"][0] in names:
+                self.set_post_tags(
+                    post,
+                    [merge_to["names"][0] if x == remove["names"][0] else x for x in names],
+                )
+        merge_to["version"] += 1
+        self.add_snapshot(
+            "merged", "tag", remove["names"][0], ["tag", merge_to["names"][0]]
+        )
+
+    def add_snapshot(self, operation: str, type_: str, id_, data=None) -> None:
+        self.snapshots.append(
+            {
+                "operation": operation,
+                "type": type_,
+                "id": id_,
+                "user": None,
+                "data": data,
+                "time": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+            }
+        )
+
+    def find_tag(self, name: str):
+        for tag in self.tags.values():
+            if name.lower() in (x.lower() for x in tag["names"]):
+                return tag
+        return None
+
+    def find_pool(self, name: str):
+        for pool in self.pools.values():
+            if name.lower() in (x.lower() for x in pool["names"]):
+                return pool
+        return None
+
+    def add_post(self, tag_names, content_token: str = None):
+        id_ = len(self.posts) + 1
+        post = {
+            "id": id_,
+            "version": 1,
+            "safety": "safe",
+            "type": "image",
+            "mimeType": "image/png",
+            "checksum": hashlib.sha1(
+                (f"{id_}.png".encode("utf-8") * 4096)[: 1024 * 1024]
+            ).hexdigest(),
+            "canvasWidth": 640,
+            "canvasHeight": 480,
+            "contentUrl": f"data/posts/{id_}.png",
+            "thumbnailUrl": f"data/generated-thumbnails/{id_}.jpg",
+            "flags": [],
+            "source": None,
+            "tags": [],
+            "relations": [],
+            "notes": [],
+            "lastEditTime": None,
+        }
+        if content_token in self.upload_checksums:
+            post["checksum"] = self.upload_checksums[content_token]
+        self.posts[id_] = post
+        self.set_post_tags(post, tag_names)
+        self.add_snapshot("created", "post", id_)
+        return post
+
+    def set_post_tags(self, post, tag_names):
+        tags = []
+        for name in tag_names:
+            tag = self.find_tag(name) or self.add_tag(name)
+            if any(x["names"] is tag["names"] for x in tags):
+                continue
+            tags.append({"names": tag["names"], "category": tag["category"], "usages": 1})
+        post["tags"] = tags
+
+
+def _filter_fields(item, fields):
+    if not fields:
+        return item
+    return {k: v for k, v in item.items() if k in fields}
+
+
+def _split_values(term: str):
+    return [x.replace("\\", "") for x in re.split(r"(?<!\\),", term)]
+
+
+def _search(items, query: str, name_key):
+    sort_desc = True
+    for term in query.split():
+        if term.startswith("sort:"):
+            sort_desc = not term.endswith(",asc")
+        elif term.startswith("-sort:"):
+            sort_desc = False
+        elif term.startswith("content-checksum:"):
+            items = [x for x in items if x.get("checksum") == term[17:]]
+        elif term.startswith("id:"):
+            ids = {int(x) for x in _split_values(term[3:])}
+            items = [x for x in items if x["id"] in ids]
+        elif term.startswith("id-max:"):
+            items = [x for x in items if x["id"] <= int(term[7:])]
+        elif term.startswith("id-min:"):
+            items = [x for x in items if x["id"] >= int(term[7:])]
+        elif name_key:
+            if term.startswith("name:"):
+                term = term[5:]
+            names = {x.lower() for x in _split_values(term)}
+            items = [x for x in items if names.intersection(y.lower() for y in x[name_key])]
+    if items and "id" in items[0]:
+        items = sorted(items, key=lambda x: x["id"], reverse=sort_desc)
+    return items
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    booru = None
+    # Emulated server capacity: requests beyond capacity are refused with 503, others
+    # take service_time seconds
+    capacity = None
+    service_time = 0.0
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status: int, payload) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        if self.command == "GET" and status == 200:
+            # Validators let clients revalidate cached responses
+            etag = f'"{hashlib.sha1(body).hexdigest()[:16]}"'
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(status)
+            self.send_header("ETag", etag)
+        else:
+            self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _not_found(self) -> None:
+        self._send(404, {"name": "NotFoundError", "description": "Not found"})
+
+    def _already_exists(self, kind: str) -> None:
+        self._send(
+            409,
+            {"name": f"{kind}AlreadyExistsError", "description": f"{kind} already exists"},
+        )
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _send_data(self, parts) -> None:
+        # Content is a deterministic function of the file name, so that checksums and
+        # partial downloads can be checked by clients
+        name = parts[-1]
+        content = (name.encode("utf-8") * 4096)[: 1024 * 1024]
+        start = 0
+        match = re.match(r"bytes=(\d+)-$", self.headers.get("Range") or "")
+        if match:
+            start = int(match.group(1))
+            if start >= len(content):
+                self.send_response(416)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+        self.send_response(206 if match else 200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(len(content) - start))
+        self.end_headers()
+        self.wfile.write(content[start:])
+
+    def _consume_body(self):
+        # Uploads are hashed and discarded so the server does not hold them in memory.
+        # The multipart head is skipped and the tail held back, so that only the file
+        # content is hashed.
+        remaining = int(self.headers.get("Content-Length") or 0)
+        boundary = self.headers.get("Content-Type", "").partition("boundary=")[2]
+        tail_size = len(f"\r\n--{boundary}--\r\n")
+        sha1 = hashlib.sha1()
+        buffered = b""
+        in_content = False
+        while remaining:
+            chunk = self.rfile.read(min(remaining, 1 << 16))
+            remaining -= len(chunk)
+            buffered += chunk
+            if not in_content:
+                head_end = buffered.find(b"\r\n\r\n")
+                if head_end < 0:
+                    continue
+                buffered = buffered[head_end + 4 :]
+                in_content = True
+            if len(buffered) > tail_size:
+                sha1.update(buffered[:-tail_size])
+                buffered = buffered[-tail_size:]
+        return int(self.headers.get("Content-Length") or 0), sha1.hexdigest()
+
+    def _handle(self, method: str) -> None:
+        if self.capacity is None:
+            return self._route(method)
+        if not self.capacity.acquire(blocking=False):
+            self._read_body()
+            return self._send(503, {"name": "ServiceUnavailable", "description": "Busy"})
+        try:
+            time.sleep(self.service_time)
+            self._route(method)
+        finally:
+            self.capacity.release()
+
+    def _route(self, method: str) -> None:
+        url = urllib.parse.urlsplit(self.path)
+        parts = [urllib.parse.unquote(x) for x in url.path.split("/") if x]
+        if parts and parts[0] == "api":
+            parts = parts[1:]
+        query = dict(urllib.parse.parse_qsl(url.query))
+        fields = query["fields"].split(",") if "fields" in query else None
+        booru = self.booru
+        if parts[:1] == ["data"] and method == "GET":
+            return self._send_data(parts)
+        if parts == ["uploads"] and method == "POST":
+            size, checksum = self._consume_body()
+            with booru.lock:
+                token = f"{len(booru.uploads):08x}-0000-0000-0000-000000000000"
+                booru.uploads[token] = size
+                booru.upload_checksums[token] = checksum
+            return self._send(200, {"token": token})
+        body = self._read_body()
+
+        with booru.lock:
+            if parts == ["snapshots"]:
+                results = list(reversed(booru.snapshots))
+                offset = int(query.get("offset", 0))
+                limit = int(query.get("limit", 100))
+                return self._send(
+                    200,
+                    {
+                        "offset": offset,
+                        "limit": limit,
+                        "total": len(results),
+                        "results": results[offset : offset + limit],
+                    },
+                )
+            if parts == ["tag-categories"]:
+                return self._send(200, {"results": booru.tag_categories})
+            if parts == ["pool-categories"]:
+                return self._send(200, {"results": booru.pool_categories})
+            if parts == ["posts", "reverse-search"] and method == "POST":
+                size = booru.uploads.get(json.loads(body)["contentToken"])
+                exact = [x for x in booru.posts.values() if x.get("contentSize") == size]
+                return self._send(
+                    200, {"exactPost": exact[0] if exact else None, "similarPosts": []}
+                )
+            if parts in (["posts"], ["tags"], ["pools"]) and method == "GET":
+                items = {
+                    "posts": booru.posts,
+                    "tags": booru.tags,
+                    "pools": booru.pools,
+                }[parts[0]]
+                name_key = None if parts[0] == "posts" else "names"
+                results = _search(list(items.values()), query.get("query", ""), name_key)
+                offset = int(query.get("offset", 0))
+                limit = int(query.get("limit", 100))
+                return self._send(
+                    200,
+                    {
+                        "query": query.get("query", ""),
+                        "offset": offset,
+                        "limit": limit,
+                        "total": len(results),
+                        "results": [
+                            _filter_fields(x, fields)
+                            for x in results[offset : offset + limit]
+                        ],
+                    },
+                )
+            if parts == ["posts"] and method == "POST":
+                data = json.loads(body)
+                post = booru.add_post(data.get("tags", []), data.get("contentToken"))
+                post["safety"] = data.get("safety", "safe")
+                post["contentSize"] = booru.uploads.get(data.get("contentToken"))
+                return self._send(200, post)
+            if len(parts) == 2 and parts[0] == "post":
+                post = booru.posts.get(int(parts[1]))
+                if post is None:
+                    return self._not_found()
+                if method == "DELETE":
+                    del booru.posts[post["id"]]
+                    booru.add_snapshot("deleted", "post", post["id"])
+                    return self._send(200, {})
+                if method == "PUT":
+                    data = json.loads(body)
+                    if data.get("version") != post["version"]:
+                        return self._send(
+                            409,
+                            {"name": "IntegrityError", "description": "Version mismatch"},
+                        )
+                    if "tags" in data:
+                        booru.set_post_tags(post, data.pop("tags"))
+                    data.pop("version")
+                    post.update(data)
+                    post["version"] += 1
+                    booru.add_snapshot("modified", "post", post["id"])
+                return self._send(200, _filter_fields(post, fields))
+            if parts == ["tags"] and method == "POST":
+                data = json.loads(body)
+                if any(booru.find_tag(x) for x in data["names"]):
+                    return self._already_exists("Tag")
+                tag = booru.add_tag(data["names"][0], data.get("category", "default"))
+                tag["names"] = data["names"]
+                return self._send(200, tag)
+            if parts == ["tag-merge"] and method == "POST":
+                data = json.loads(body)
+                remove = booru.find_tag(data["remove"])
+                merge_to = booru.find_tag(data["mergeTo"])
+                if remove is None or merge_to is None:
+                    return self._not_found()
+                if (remove["version"], merge_to["version"]) != (
+                    data.get("removeVersion"),
+                    data.get("mergeToVersion"),
+                ):
+                    return self._send(
+                        409, {"name": "IntegrityError", "description": "Version mismatch"}
+                    )
+                booru.merge_tags(remove, merge_to)
+                return self._send(200, merge_to)
+            if parts == ["pool"] and method == "POST":
+                data = json.loads(body)
+                if any(booru.find_pool(x) for x in data["names"]):
+                    return self._already_exists("Pool")
+                pool = booru.add_pool(
+                    data["names"][0], data.get("category", "default"), data.get("posts", [])
+                )
+                pool["names"] = data["names"]
+                return self._send(200, pool)
+            if len(parts) == 2 and parts[0] == "pool":
+                pool = booru.pools.get(int(parts[1]))
+                if pool is None:
+                    return self._not_found()
+                if method == "PUT":
+                    data = json.loads(body)
+                    if data.pop("version", None) != pool["version"]:
+                        return self._send(
+                            409,
+                            {"name": "IntegrityError", "description": "Version mismatch"},
+                        )
+                    if "posts" in data:
+                        booru.set_pool_posts(pool, data.pop("posts"))
+                    pool.update(data)
+                    pool["version"] += 1
+                    booru.add_snapshot("modified", "pool", pool["id"])
+                return self._send(200, _filter_fields(pool, fields))
+            if len(parts) == 2 and parts[0] == "tag":
+                tag = booru.find_tag(parts[1])
+                if tag is None:
+                    return self._not_found()
+                if method == "PUT":
+                    data = json.loads(body)
+                    data.pop("version", None)
+                    tag.update(data)
+                    tag["version"] += 1
+                    booru.add_snapshot("modified", "tag", tag["names"][0])
+                return self._send(200, _filter_fields(tag, fields))
+        return self._not_found()
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_PUT(self):
+        self._handle("PUT")
+
+    def do_DELETE(self):
+        self._handle("DELETE")
+
+
+def serve(
+    num_posts: int = 0,
+    num_tags: int = 0,
+    port: int = 0,
+    capacity: int = None,
+    service_time: float = 0.0,
+) -> ThreadingHTTPServer:
+    handler = type(
+        "Handler",
+        (_Handler,),
+        {
+            "booru": _Booru(num_posts, num_tags),
+            "capacity": threading.BoundedSemaphore(capacity) if capacity else None,
+            "service_time": service_time,
+        },
+    )
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def base_url(server: ThreadingHTTPServer) -> str:
+    return f"http://127.0.0.1:{server.server_address[1]}"
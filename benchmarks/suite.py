@@ -0,0 +1,213 @@
+"""End-to-end benchmarks of the hot paths against the replay server
+
+Each scenario is timed against a replay server running in a separate process, reporting
+requests/sec, p50/p99 request latency and the peak memory allocated by the client.
+The fixture is recorded from the stub server first if it does not exist.
+
+Run from the repository root:
+python -m benchmarks.suite
+python -m benchmarks.suite --save results.json
+python -m benchmarks.suite --baseline results.json   # exits 1 on a regression
+"""
+
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import pyszuru
+from benchmarks import stub_server
+from benchmarks.replay_server import Recorder
+
+_DEFAULT_FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "default.json")
+_NUM_POSTS = 200
+_NUM_TAGS = 50
+
+
+def _search_scan(api: pyszuru.API) -> None:
+    for _ in api.search_post("", page_size=50):
+        pass
+
+
+def _pull_push(api: pyszuru.API) -> None:
+    for i in range(1, 51):
+        post = api.getPost(i)
+        post.safety = "sketchy" if post.safety == "safe" else "safe"
+        post.push()
+
+
+def _tag_assignment(api: pyszuru.API) -> None:
+    # Start from an empty identity map, so that names are resolved with tag searches
+    api.clear_cache()
+    for i in range(1, 51):
+        post = api.getPost(i)
+        post.tags = [f"tag_{(i + j) % _NUM_TAGS}" for j in range(10)]
+        post.push()
+
+
+def _uploads(api: pyszuru.API) -> None:
+    for i in range(10):
+        content = (f"upload {i}".encode("utf-8") * 65536)[: 256 * 1024]
+        api.createPost(api.upload_file(io.BytesIO(content)), "safe")
+
+
+def _tag_merge(api: pyszuru.API) -> None:
+    for i in range(10):
+        target = api.getTag(f"tag_{i}")
+        target.merge_from(api.getTag(f"tag_{_NUM_TAGS - 1 - i}"), add_as_alias=False)
+
+
+def _pools(api: pyszuru.API) -> None:
+    names = [f"pool_{i}" for i in range(10)]
+    for i, pool in enumerate(api.get_or_create_pools(names).values()):
+        ids = ",".join(str(x) for x in range(i * 10 + 1, i * 10 + 11))
+        pool.posts = list(api.search_post(f"id:{ids}", page_size=10))
+        pool.push()
+
+
+_SCENARIOS = {
+    "search_scan": _search_scan,
+    "pull_push": _pull_push,
+    "tag_assignment": _tag_assignment,
+    "uploads": _uploads,
+    "tag_merge": _tag_merge,
+    "pools": _pools,
+}
+
+
+def _record(path: str) -> None:
+    server = stub_server.serve(num_posts=_NUM_POSTS, num_tags=_NUM_TAGS)
+    api = pyszuru.API(stub_server.base_url(server))
+    recorder = Recorder(api)
+    for scenario in _SCENARIOS.values():
+        scenario(api)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    recorder.save(path)
+    api.close()
+    server.shutdown()
+
+
+def _start_replay_server(fixture: str, args) -> subprocess.Popen:
+    command = [
+        sys.executable,
+        "-m",
+        "benchmarks.replay_server",
+        fixture,
+        "--latency",
+        str(args.latency),
+        "--jitter",
+        str(args.jitter),
+        "--error-rate",
+        str(args.error_rate),
+        "--drop-rate",
+        str(args.drop_rate),
+    ]
+    return subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+
+
+def _percentile(values, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+
+def _run(url: str, scenario, iterations: int) -> dict:
+    durations = []
+    errors = []
+
+    def record(event: pyszuru.RequestEvent) -> None:
+        durations.append(event.duration)
+        if event.error is not None or event.status >= 400:
+            errors.append(event)
+
+    api = pyszuru.API(url)
+    api.add_request_hook(after=record)
+    scenario(api)  # warm up connections and caches
+    durations.clear()
+    errors.clear()
+    started = time.perf_counter()
+    for _ in range(iterations):
+        scenario(api)
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    scenario(api)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    api.close()
+    return {
+        "requests_per_second": len(durations) / elapsed,
+        "errors": len(errors),
+        "p50_ms": _percentile(durations, 0.5) * 1000,
+        "p99_ms": _percentile(durations, 0.99) * 1000,
+        "peak_memory_kb": peak / 1024,
+    }
+
+
+def _regressions(results: dict, baseline: dict, tolerance: float):
+    for name, result in results.items():
+        before = baseline.get(name)
+        if not before:
+            continue
+        if result["requests_per_second"] < before["requests_per_second"] * (1 - tolerance):
+            yield f"{name}: requests/sec {before['requests_per_second']:.1f} -> " + (
+                f"{result['requests_per_second']:.1f}"
+            )
+        for key in ("p99_ms", "peak_memory_kb"):
+            if result[key] > before[key] * (1 + tolerance):
+                yield f"{name}: {key} {before[key]:.1f} -> {result[key]:.1f}"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fixture", default=_DEFAULT_FIXTURE)
+    parser.add_argument("--record", action="store_true", help="re-record the fixture")
+    parser.add_argument("--iterations", type=int, default=3)
+    parser.add_argument("--scenario", action="append", choices=sorted(_SCENARIOS))
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--drop-rate", type=float, default=0.0)
+    parser.add_argument("--save", help="write results to this JSON file")
+    parser.add_argument("--baseline", help="compare against results saved with --save")
+    parser.add_argument("--tolerance", type=float, default=0.5)
+    args = parser.parse_args()
+
+    if args.record or not os.path.exists(args.fixture):
+        _record(args.fixture)
+
+    process = _start_replay_server(args.fixture, args)
+    try:
+        url = process.stdout.readline().strip()
+        results = {}
+        print(
+            f"{'scenario':16} {'req/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'peak KiB':>10} "
+            f"{'errors':>7}"
+        )
+        for name in args.scenario or _SCENARIOS:
+            result = results[name] = _run(url, _SCENARIOS[name], args.iterations)
+            print(
+                f"{name:16} {result['requests_per_second']:10.1f} {result['p50_ms']:8.2f} "
+                f"{result['p99_ms']:8.2f} {result['peak_memory_kb']:10.1f} "
+                f"{result['errors']:7}"
+            )
+    finally:
+        process.terminate()
+        process.wait()
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = list(_regressions(results, json.load(f), args.tolerance))
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,62 @@
-from typing import Generator, List
+from typing import (
+    Any,
+    AsyncGenerator,
+    BinaryIO,
+    Callable,
+    Dict,
+    Generator,
+    Iterable,
+    List,
+    Optional,
+    Union,
+)
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 
 from .api import API as _API
 from .api import FileToken, SzurubooruHTTPError
+from .bulk import PushResult, _get_or_create, _get_or_create_async, _push_all
+from .cache import ResponseCache
+from .category import CategoryRegistry
+from .codec import JSONCodec, MsgspecCodec, OrjsonCodec
+from .download import DownloadStats, _download_posts
+from .importer import ImportStats, _import_files
+from .metrics import MetricsCollector, RequestEvent, RequestInfo
 from .pool import Pool
 from .post import Post, PostNote
-from .resource import Resource, ResourceNotSynchronized
+from .record import PoolRecord, PostRecord, TagRecord
+from .resource import Resource, ResourceNotSynchronized, _hydrate
+from .retry import RetryPolicy, RetryStats
 from .search import (
     SearchResult,
     _search_generic,
+    _search_generic_async,
+    _search_keyset,
     search_by_image,
     search_post,
     search_tag,
 )
+from .store import LocalStore
+from .sync import ChangeFeed
 from .tag import Tag
+from .throttle import AdaptiveConcurrency, RateLimiter, TokenBucket
 
 
 class API(_API):
-    def getPost(self, id_: int) -> Post:
+    def _tag_category(self, category: Optional[str]) -> str:
+        if category is None:
+            return self.tag_categories.default
+        return self.tag_categories.validate(category)
+
+    def _pool_category(self, category: Optional[str]) -> str:
+        if category is None:
+            return self.pool_categories.default
+        return self.pool_categories.validate(category)
+
+    def getPost(self, id_: int, fields: List[str] = None) -> Post:
         p = Post(self, {"id": id_})
-        p.pull()
+        p.pull(fields)
         return p
 
     def createPost(self, content: FileToken, safety: str) -> Post:
@@ -29,49 +67,42 @@ class API(_API):
             "safety": safety,
             "contentToken": content.token,
         }
+        p._content_checksum = content.checksum
         p.push()
         return p
 
-    def getTag(self, id_: str) -> Tag:
+    def getTag(self, id_: str, fields: List[str] = None) -> Tag:
         t = Tag(self, {"names": [id_]})
-        t.pull()
+        t.pull(fields)
         return t
 
-    def createTag(self, name: str) -> Tag:
+    def createTag(self, name: str, category: str = None) -> Tag:
         if not isinstance(name, str):
             raise ValueError("Tag name must be a string")
 
-        # Get default tag category
-        tag_cats = self._call("GET", ["tag-categories"])["results"]
-        default_cat = [x for x in tag_cats if x["default"]]
-        assert len(default_cat) == 1
-        default_cat = default_cat[0]["name"]
+        category = self._tag_category(category)
 
         # Create and return tag
         t = Tag(self, {})
-        t._json_new = {"names": [name], "category": default_cat}
+        t._json_new = {"names": [name], "category": category}
         t.push()
         return t
 
-    def getPool(self, id_: int) -> Pool:
+    def getPool(self, id_: int, fields: List[str] = None) -> Pool:
         p = Pool(self, {"id": id_})
-        p.pull()
+        p.pull(fields)
         return p
 
-    def createPool(self, name: str) -> Pool:
+    def createPool(self, name: str, category: str = None) -> Pool:
         if not isinstance(name, str):
             raise ValueError("Pool name must be a string")
 
-        # Get default pool category
-        tag_cats = self._call("GET", ["pool-categories"])["results"]
-        default_cat = [x for x in tag_cats if x["default"]]
-        assert len(default_cat) == 1
-        default_cat = default_cat[0]["name"]
+        category = self._pool_category(category)
 
         p = Pool(self, {})
         p._json_new = {
             "names": [name],
-            "category": default_cat,
+            "category": category,
         }
 
         # For some reason, the API uses POST /pool instead of POST /pools,
@@ -86,15 +117,72 @@ class API(_API):
             p._get_class_urlparts = _unmonkeypatch
         return p
 
+    def get_or_create_tags(
+        self,
+        names: Iterable[str],
+        category: str = None,
+        workers: int = 8,
+        chunk_size: int = 50,
+    ) -> Dict[str, Tag]:
+        """
+        Returns a map of the given names to tags, creating the tags that do not exist
+        with the given category (or the default one). Existing tags keep their category.
+        """
+        category = self._tag_category(category)
+        return _get_or_create(
+            Tag,
+            names,
+            lambda q: self.search_tag(q, chunk_size, fields=Tag._lazy_load_components()),
+            lambda x: self.createTag(x, category),
+            workers,
+            chunk_size,
+        )
+
+    def get_or_create_pools(
+        self,
+        names: Iterable[str],
+        category: str = None,
+        workers: int = 8,
+        chunk_size: int = 50,
+    ) -> Dict[str, Pool]:
+        """
+        Returns a map of the given names to pools, creating the pools that do not exist
+        with the given category (or the default one)
+        """
+        category = self._pool_category(category)
+        return _get_or_create(
+            Pool,
+            names,
+            lambda q: self.search_pool(q, chunk_size, fields=Pool._lazy_load_components()),
+            lambda x: self.createPool(x, category),
+            workers,
+            chunk_size,
+        )
+
     def search_tag(  # noqa: F811
         self,
         search_query: str,
         page_size: int = 20,
         show_progress_bar: bool = False,
         eager_load: bool = False,
+        prefetch: int = 0,
+        workers: int = 1,
+        fields: List[str] = None,
+        batch_hydrate: bool = False,
+        compact: bool = False,
     ) -> Generator[Tag, None, None]:
         return _search_generic(
-            self, search_query, Tag, page_size, show_progress_bar, eager_load
+            self,
+            search_query,
+            Tag,
+            page_size,
+            show_progress_bar,
+            eager_load,
+            prefetch,
+            workers,
+            fields,
+            batch_hydrate,
+            compact,
         )
 
     def search_post(  # noqa: F811
@@ -103,9 +191,45 @@ class API(_API):
         page_size: int = 20,
         show_progress_bar: bool = False,
         eager_load: bool = False,
+        prefetch: int = 0,
+        workers: int = 1,
+        pagination: str = "offset",
+        cursor: int = None,
+        ascending: bool = False,
+        fields: List[str] = None,
+        batch_hydrate: bool = False,
+        compact: bool = False,
     ) -> Generator[Post, None, None]:
+        if pagination == "keyset":
+            if prefetch:
+                raise ValueError("Keyset pagination does not support prefetching")
+            return _search_keyset(
+                self,
+                search_query,
+                Post,
+                page_size,
+                show_progress_bar,
+                eager_load,
+                cursor,
+                ascending,
+                fields,
+                batch_hydrate,
+                compact,
+            )
+        elif pagination != "offset":
+            raise ValueError("Pagination must be of value offset or keyset")
         return _search_generic(
-            self, search_query, Post, page_size, show_progress_bar, eager_load
+            self,
+            search_query,
+            Post,
+            page_size,
+            show_progress_bar,
+            eager_load,
+            prefetch,
+            workers,
+            fields,
+            batch_hydrate,
+            compact,
         )
 
     def search_pool(  # noqa: F811
@@ -114,15 +238,77 @@ class API(_API):
         page_size: int = 20,
         show_progress_bar: bool = False,
         eager_load: bool = False,
+        prefetch: int = 0,
+        workers: int = 1,
+        fields: List[str] = None,
+        batch_hydrate: bool = False,
+        compact: bool = False,
     ) -> Generator[Pool, None, None]:
         return _search_generic(
-            self, search_query, Pool, page_size, show_progress_bar, eager_load
+            self,
+            search_query,
+            Pool,
+            page_size,
+            show_progress_bar,
+            eager_load,
+            prefetch,
+            workers,
+            fields,
+            batch_hydrate,
+            compact,
+        )
+
+    def hydrate(
+        self, resources: Iterable[Resource], fields: List[str], chunk_size: int = 100
+    ) -> None:
+        _hydrate(self, resources, fields, chunk_size)
+
+    def push_all(
+        self,
+        resources: Iterable[Resource],
+        workers: int = 8,
+        rate_limit: float = None,
+        retries: int = 3,
+        backoff: float = 0.5,
+    ) -> List[PushResult]:
+        return _push_all(resources, workers, rate_limit, retries, backoff)
+
+    def download_posts(
+        self,
+        posts: Iterable[Post],
+        dest_dir: str,
+        workers: int = 4,
+        chunk_size: int = 64 * 1024,
+    ) -> DownloadStats:
+        return _download_posts(self, posts, dest_dir, workers, chunk_size)
+
+    def import_files(
+        self,
+        source: Union[str, Iterable[str]],
+        safety: str = "safe",
+        workers: int = 4,
+        max_inflight_bytes: int = 64 * 1024 * 1024,
+        skip_duplicates: bool = False,
+        journal_path: str = None,
+    ) -> ImportStats:
+        Post._validate_safety(safety)
+        return _import_files(
+            self,
+            source,
+            safety,
+            workers,
+            max_inflight_bytes,
+            skip_duplicates,
+            journal_path,
         )
 
     def search_by_image(self, image: FileToken) -> List[SearchResult]:  # noqa: F811
         result = self._call(
             "POST", ["posts", "reverse-search"], body={"contentToken": image.token}
         )
+        return self._parse_reverse_search(result)
+
+    def _parse_reverse_search(self, result: Dict[str, Any]) -> List[SearchResult]:
         ret = [
             SearchResult(post=Post(self, x["post"]), distance=x["distance"], exact=False)
             for x in result["similarPosts"]
@@ -135,3 +321,219 @@ class API(_API):
                 ),
             )
         return ret
+
+
+class AsyncAPI:
+    """
+    asyncio counterpart of API, wrapping an API built from the same arguments. Blocking
+    HTTP calls are dispatched to a thread pool sharing its pooled session, with at most
+    max_concurrency requests in flight.
+
+    Resources returned by AsyncAPI belong to the wrapped API (see the api attribute),
+    so their properties behave as with API: reading a property that was not loaded, or
+    assigning a tag or pool category or tags by name, makes a blocking request. Load
+    fields up front with fields= or pull(), and make such assignments with assign().
+    """
+
+    def __init__(self, *args, max_concurrency: int = 64, **kwargs):
+        kwargs.setdefault("pool_maxsize", max_concurrency)
+        self.api = API(*args, **kwargs)
+        self._max_concurrency = max_concurrency
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency)
+        self._semaphore = None
+
+    async def _run_async(self, fn, *args):
+        # Semaphore is created lazily so that it binds to the running event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.BoundedSemaphore(self._max_concurrency)
+        async with self._semaphore:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._executor, fn, *args
+            )
+
+    async def _call_async(
+        self,
+        method: str,
+        urlparts: List[str],
+        urlquery: Dict[str, str] = None,
+        body: Dict[str, Any] = None,
+        reconcile: Callable[[], Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        return await self._run_async(
+            self.api._call, method, urlparts, urlquery, body, reconcile
+        )
+
+    def add_request_hook(
+        self,
+        before: Callable[[RequestInfo], None] = None,
+        after: Callable[[RequestEvent], None] = None,
+    ) -> None:
+        self.api.add_request_hook(before, after)
+
+    def clear_cache(self) -> None:
+        self.api.clear_cache()
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+        self.api.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        self.close()
+
+    async def pull(self, resource: Resource, fields: List[str] = None) -> None:
+        await self._run_async(resource.pull, fields)
+
+    async def push(self, resource: Resource) -> None:
+        await self._run_async(resource.push)
+
+    async def assign(self, resource: Resource, **values) -> None:
+        """Sets properties of resource, e.g. assign(tag, category="meta")"""
+
+        def set_all() -> None:
+            for name, value in values.items():
+                setattr(resource, name, value)
+
+        await self._run_async(set_all)
+
+    async def upload_file(
+        self,
+        file: Union[BinaryIO, str],
+        progress: Callable[[int, int], None] = None,
+        chunk_size: int = 64 * 1024,
+    ) -> FileToken:
+        return await self._run_async(self.api.upload_file, file, progress, chunk_size)
+
+    async def getPost(self, id_: int, fields: List[str] = None) -> Post:
+        return await self._run_async(self.api.getPost, id_, fields)
+
+    async def createPost(self, content: FileToken, safety: str) -> Post:
+        return await self._run_async(self.api.createPost, content, safety)
+
+    async def getTag(self, id_: str, fields: List[str] = None) -> Tag:
+        return await self._run_async(self.api.getTag, id_, fields)
+
+    async def createTag(self, name: str, category: str = None) -> Tag:
+        return await self._run_async(self.api.createTag, name, category)
+
+    async def getPool(self, id_: int, fields: List[str] = None) -> Pool:
+        return await self._run_async(self.api.getPool, id_, fields)
+
+    async def createPool(self, name: str, category: str = None) -> Pool:
+        return await self._run_async(self.api.createPool, name, category)
+
+    async def get_or_create_tags(
+        self, names: Iterable[str], category: str = None, chunk_size: int = 50
+    ) -> Dict[str, Tag]:
+        category = await self._run_async(self.api._tag_category, category)
+        return await _get_or_create_async(
+            Tag,
+            names,
+            lambda q: self.search_tag(q, chunk_size, fields=Tag._lazy_load_components()),
+            lambda x: self.createTag(x, category),
+            chunk_size,
+        )
+
+    async def get_or_create_pools(
+        self, names: Iterable[str], category: str = None, chunk_size: int = 50
+    ) -> Dict[str, Pool]:
+        category = await self._run_async(self.api._pool_category, category)
+        return await _get_or_create_async(
+            Pool,
+            names,
+            lambda q: self.search_pool(q, chunk_size, fields=Pool._lazy_load_components()),
+            lambda x: self.createPool(x, category),
+            chunk_size,
+        )
+
+    def search_tag(
+        self,
+        search_query: str,
+        page_size: int = 20,
+        show_progress_bar: bool = False,
+        eager_load: bool = False,
+        fields: List[str] = None,
+    ) -> AsyncGenerator[Tag, None]:
+        return _search_generic_async(
+            self, search_query, Tag, page_size, show_progress_bar, eager_load, fields
+        )
+
+    def search_post(
+        self,
+        search_query: str,
+        page_size: int = 20,
+        show_progress_bar: bool = False,
+        eager_load: bool = False,
+        fields: List[str] = None,
+    ) -> AsyncGenerator[Post, None]:
+        return _search_generic_async(
+            self, search_query, Post, page_size, show_progress_bar, eager_load, fields
+        )
+
+    def search_pool(
+        self,
+        search_query: str,
+        page_size: int = 20,
+        show_progress_bar: bool = False,
+        eager_load: bool = False,
+        fields: List[str] = None,
+    ) -> AsyncGenerator[Pool, None]:
+        return _search_generic_async(
+            self, search_query, Pool, page_size, show_progress_bar, eager_load, fields
+        )
+
+    async def search_by_image(self, image: FileToken) -> List[SearchResult]:
+        return await self._run_async(self.api.search_by_image, image)
+
+    async def hydrate(
+        self, resources: Iterable[Resource], fields: List[str], chunk_size: int = 100
+    ) -> None:
+        await self._run_async(self.api.hydrate, list(resources), fields, chunk_size)
+
+    async def push_all(
+        self,
+        resources: Iterable[Resource],
+        workers: int = 8,
+        rate_limit: float = None,
+        retries: int = 3,
+        backoff: float = 0.5,
+    ) -> List[PushResult]:
+        return await self._run_async(
+            self.api.push_all, list(resources), workers, rate_limit, retries, backoff
+        )
+
+    async def download_posts(
+        self,
+        posts: Iterable[Post],
+        dest_dir: str,
+        workers: int = 4,
+        chunk_size: int = 64 * 1024,
+    ) -> DownloadStats:
+        return await self._run_async(
+            self.api.download_posts, list(posts), dest_dir, workers, chunk_size
+        )
+
+    async def import_files(
+        self,
+        source: Union[str, Iterable[str]],
+        safety: str = "safe",
+        workers: int = 4,
+        max_inflight_bytes: int = 64 * 1024 * 1024,
+        skip_duplicates: bool = False,
+        journal_path: str = None,
+    ) -> ImportStats:
+        # The importer runs its own worker threads over the wrapped API
+        return await self._run_async(
+            self.api.import_files,
+            source,
+            safety,
+            workers,
+            max_inflight_bytes,
+            skip_duplicates,
+            journal_path,
+        )
+
+    def __str__(self) -> str:
+        return f"Async {self.api}"
@@ -1,19 +1,36 @@
-from typing import Any, BinaryIO, Dict, List, Union
+from typing import Any, BinaryIO, Callable, Dict, List, Optional, Tuple, Union
 
+import hashlib
 import json
 import os
 import re
+import time
 import urllib.parse
 from base64 import b64encode
 
 import requests
 from appdirs import user_data_dir
+from requests.adapters import HTTPAdapter
+
+from .cache import ResponseCache, _ResourceCache
+from .category import CategoryRegistry
+from .codec import JSONCodec, default_codec
+from .metrics import RequestEvent, RequestInfo, _current_lazy_source, _url_template
+from .multipart import _MultipartFileStream
+from .retry import RetryPolicy, RetryStats, _not_processed
+from .throttle import (
+    _OVERLOAD_STATUS_CODES,
+    AdaptiveConcurrency,
+    RateLimiter,
+    _retry_after,
+)
 
 
 class FileToken:
-    def __init__(self, token: str, filepath: str):
+    def __init__(self, token: str, filepath: str, checksum: str = None):
         self._token = token
         self._filepath = filepath
+        self._checksum = checksum
 
     @property
     def token(self):
@@ -23,6 +40,11 @@ class FileToken:
     def filepath(self):
         return self._filepath
 
+    @property
+    def checksum(self):
+        """SHA1 of the uploaded content"""
+        return self._checksum
+
     def __str__(self) -> str:
         return f"<Upload token for file at {self._filepath}>"
 
@@ -31,6 +53,23 @@ class SzurubooruHTTPError(requests.exceptions.HTTPError):
     pass
 
 
+def _holds(stored: Any, sent: Any) -> bool:
+    """Whether a value stored on the server is the one sent in a request body"""
+    if isinstance(stored, dict):
+        if isinstance(sent, dict):
+            return all(_holds(stored.get(k), v) for k, v in sent.items())
+        # Tags, posts and pools are sent by primary name or id
+        return sent == stored.get("id") or sent in stored.get("names", ())
+    if isinstance(stored, list) and isinstance(sent, list):
+        if stored and all(
+            isinstance(x, dict) and ("id" in x or "names" in x) for x in stored
+        ):
+            # The server may add implied tags, so only the sent references are required
+            return all(any(_holds(x, y) for x in stored) for y in sent)
+        return len(stored) == len(sent) and all(map(_holds, stored, sent))
+    return stored == sent
+
+
 class API:
     _token_checker = re.compile(
         r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$"
@@ -48,7 +87,7 @@ class API:
                 msg = f"{msg['name']}: {msg['description']}"
             except ValueError:
                 msg = r.text
-            raise SzurubooruHTTPError(msg)
+            raise SzurubooruHTTPError(msg, response=r)
 
     def __init__(
         self,
@@ -57,6 +96,20 @@ class API:
         password: str = None,
         token: str = None,
         api_url: str = "api",
+        pool_connections: int = 10,
+        pool_maxsize: int = 10,
+        pool_block: bool = False,
+        keep_alive: bool = True,
+        cache_size: int = 1024,
+        cache_ttl: float = 300,
+        resolve_tag_names: bool = True,
+        rate_limiter: RateLimiter = None,
+        concurrency: AdaptiveConcurrency = None,
+        retry_policy: RetryPolicy = None,
+        json_codec: JSONCodec = None,
+        response_cache: ResponseCache = None,
+        category_ttl: float = 600,
+        timeout: Union[float, Tuple[float, float]] = (10, 60),
     ):
         # Extract Base URL parts
         parsed_base_url = urllib.parse.urlsplit(base_url)
@@ -104,6 +157,69 @@ class API:
         elif self.username:
             raise ValueError("Username specified without authentication method")
 
+        # Create pooled HTTP session
+        # pool_connections is the number of hosts to keep pools for, pool_maxsize is
+        # the number of connections kept alive per host
+        self._session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            pool_block=pool_block,
+        )
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        if not keep_alive:
+            self._session.headers["Connection"] = "close"
+
+        # Seconds to wait for a connection and between bytes received, or one value for
+        # both, so that a stalled request fails and can be retried. None waits forever.
+        self.timeout = tuple(timeout) if isinstance(timeout, list) else timeout
+
+        # Identity map of resources, so that the same tag, post or pool is represented by
+        # the same object across this API instance
+        self._resource_cache = _ResourceCache(cache_size, cache_ttl)
+
+        # Whether tag names assigned to posts and tags are looked up on the server
+        self.resolve_tag_names = resolve_tag_names
+
+        # Client-side throttling, shared by every thread using this API instance
+        self.rate_limiter = rate_limiter
+        self.concurrency = concurrency
+
+        # Retries of failed requests, and counters of retries and latency
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.retry_stats = RetryStats()
+
+        # Encoding of request bodies and decoding of responses
+        self.json_codec = json_codec or default_codec()
+
+        # Optional cache of GET responses, revalidated with ETag/Last-Modified
+        self.response_cache = response_cache
+
+        # Tag and pool categories, loaded on first use and reused by every creation
+        self.tag_categories = CategoryRegistry(self, "tag", category_ttl)
+        self.pool_categories = CategoryRegistry(self, "pool", category_ttl)
+
+        # Functions called around every HTTP request, see add_request_hook
+        self._before_request_hooks = []
+        self._after_request_hooks = []
+
+    def clear_cache(self) -> None:
+        self._resource_cache.clear()
+        self.tag_categories.invalidate()
+        self.pool_categories.invalidate()
+        if self.response_cache is not None:
+            self.response_cache.clear()
+
+    def close(self) -> None:
+        self._session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
     def _create_api_url(self, parts: List[str], query: Dict[str, str] = None) -> str:
         path = [self._api_path_prefix] + [
             urllib.parse.quote(str(part), safe="") for part in parts
@@ -115,34 +231,274 @@ class API:
             (self._api_scheme, self._api_netloc, "/".join(path), query, None)
         )
 
+    def add_request_hook(
+        self,
+        before: Callable[[RequestInfo], None] = None,
+        after: Callable[[RequestEvent], None] = None,
+    ) -> None:
+        """
+        Registers functions called before and after every HTTP request, including each
+        retry attempt, with its method and URL template (e.g. post/{id}), and afterwards
+        its status, bytes sent and received, duration and error. Requests made to lazily
+        load a property carry the property's name in lazy (e.g. Post.tags).
+        """
+        if before:
+            self._before_request_hooks.append(before)
+        if after:
+            self._after_request_hooks.append(after)
+
+    def _request(
+        self, method: str, template: str, url: str, **kwargs
+    ) -> requests.models.Response:
+        """
+        Sends a request through the rate limiter and concurrency controller, reporting
+        it to the request hooks
+        """
+        endpoint = template.partition("/")[0]
+        lazy = _current_lazy_source()
+        for hook in self._before_request_hooks:
+            hook(RequestInfo(method, template, url, lazy))
+        if self.rate_limiter:
+            self.rate_limiter.acquire(endpoint)
+        if self.concurrency:
+            self.concurrency.acquire()
+        started = time.monotonic()
+        response = error = None
+        overloaded = True
+        try:
+            response = self._session.request(method, url, timeout=self.timeout, **kwargs)
+            overloaded = response.status_code in _OVERLOAD_STATUS_CODES
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            duration = time.monotonic() - started
+            if self.concurrency:
+                self.concurrency.release(duration, overloaded)
+            if self._after_request_hooks:
+                self._report(method, template, url, response, error, duration, lazy)
+        if overloaded and self.rate_limiter:
+            delay = _retry_after(response)
+            if delay:
+                self.rate_limiter.backoff(endpoint, delay)
+        return response
+
+    def _report(
+        self,
+        method: str,
+        template: str,
+        url: str,
+        response: Optional[requests.models.Response],
+        error: Optional[Exception],
+        duration: float,
+        lazy: Optional[str],
+    ) -> None:
+        bytes_sent = bytes_received = None
+        if response is not None:
+            body = response.request.body
+            bytes_sent = len(body) if body is not None else 0
+            # Streamed responses are not read yet, so rely on the announced length
+            if response._content_consumed:
+                bytes_received = len(response.content)
+            elif "Content-Length" in response.headers:
+                bytes_received = int(response.headers["Content-Length"])
+        event = RequestEvent(
+            method,
+            template,
+            url,
+            response.status_code if response is not None else None,
+            bytes_sent,
+            bytes_received,
+            duration,
+            error,
+            lazy,
+        )
+        for hook in self._after_request_hooks:
+            hook(event)
+
+    def _send(
+        self,
+        method: str,
+        template: str,
+        url: str,
+        build: Callable[[], Dict[str, Any]],
+        idempotent: bool,
+        reconcile: Callable[[], Optional[Dict[str, Any]]] = None,
+    ) -> Tuple[Optional[requests.models.Response], Optional[Dict[str, Any]]]:
+        """
+        Sends a request, retrying it according to the retry policy. build returns the
+        request arguments for each attempt. A request that is not idempotent is only
+        retried when it certainly was not processed, or when reconcile, which looks up
+        the server state, finds that it was not applied. Returns the last response, or
+        the data found by reconcile if the request turned out to have been applied.
+        """
+        policy = self.retry_policy
+        endpoint = template.partition("/")[0]
+        started = time.monotonic()
+        attempt = 0
+        # Whether an earlier attempt may have been applied even though it failed
+        maybe_applied = False
+        while True:
+            attempt += 1
+            response = error = None
+            try:
+                response = self._request(method, template, url, **build())
+            except requests.exceptions.RequestException as e:
+                error = e
+            if response is not None:
+                if response.status_code == 409 and maybe_applied and reconcile:
+                    data = reconcile()
+                    if data is not None:
+                        self.retry_stats._record(
+                            endpoint, attempt, time.monotonic() - started, reconciled=True
+                        )
+                        return None, data
+                if response.status_code not in policy.status_codes:
+                    self.retry_stats._record(endpoint, attempt, time.monotonic() - started)
+                    return response, None
+
+            not_processed = _not_processed(error, response)
+            retry = idempotent or not_processed
+            if not retry and reconcile:
+                data = reconcile()
+                if data is not None:
+                    self.retry_stats._record(
+                        endpoint, attempt, time.monotonic() - started, reconciled=True
+                    )
+                    return None, data
+                retry = True
+            delay = policy._delay(attempt, response)
+            elapsed = time.monotonic() - started
+            if (
+                not retry
+                or attempt >= policy.max_attempts
+                or elapsed + delay > policy.max_elapsed
+            ):
+                self.retry_stats._record(endpoint, attempt, elapsed, gave_up=True)
+                if error is not None:
+                    raise error
+                return response, None
+            maybe_applied = maybe_applied or not not_processed
+            time.sleep(delay)
+
+    def _reconcile_put(
+        self, template: str, url: str, body: Dict[str, Any]
+    ) -> Optional[Dict[str, Any]]:
+        # A retried PUT conflicting with the version it was sent with was applied by an
+        # earlier attempt if the server is exactly one version ahead and holds the sent
+        # values, rather than those of another client's edit
+        response = self._request("GET", template, url, headers=self._api_headers)
+        self._check_api_response(response)
+        data = self.json_codec.loads(response.content)
+        if data.get("version") != body["version"] + 1:
+            return None
+        for key, value in body.items():
+            # Upload tokens are not part of the resource, so they cannot be checked
+            if key != "version" and key in data and not _holds(data[key], value):
+                return None
+        return data
+
     def _call(
         self,
         method: str,
         urlparts: List[str],
         urlquery: Dict[str, str] = None,
         body: Dict[str, Any] = None,
+        reconcile: Callable[[], Optional[Dict[str, Any]]] = None,
+        use_cache: bool = True,
     ) -> Dict[str, Any]:
         req_kwargs = {"headers": self._api_headers}
         if body:
-            req_kwargs["json"] = body
-        response = requests.request(
-            method, self._create_api_url(urlparts, urlquery), **req_kwargs
-        )
+            req_kwargs["data"] = self.json_codec.dumps(body)
+            req_kwargs["headers"] = {
+                **self._api_headers,
+                "Content-Type": "application/json",
+            }
+        url = self._create_api_url(urlparts, urlquery)
+        template = _url_template(urlparts)
+        if method == "PUT" and reconcile is None and body and body.get("version"):
+            reconcile = lambda: self._reconcile_put(template, url, body)  # noqa: E731
+        cache = self.response_cache if method == "GET" else None
+        cached = None
+        # Without use_cache the server is always asked, and the response still stored
+        if cache is not None and use_cache:
+            cached, fresh = cache._lookup(url, template)
+            if fresh:
+                return self.json_codec.loads(cached.body)
+            if cached is not None:
+                req_kwargs["headers"] = {
+                    **req_kwargs["headers"],
+                    **cached.conditional_headers(),
+                }
+        try:
+            response, data = self._send(
+                method,
+                template,
+                url,
+                lambda: req_kwargs,
+                # PUT and DELETE requests carry the resource version, so a repeated one
+                # fails with a conflict instead of being applied twice
+                idempotent=method in ("GET", "HEAD", "PUT", "DELETE"),
+                reconcile=reconcile,
+            )
+        finally:
+            if method != "GET" and self.response_cache is not None:
+                self.response_cache.invalidate(template)
+        if data is not None:
+            return data
+        if cached is not None and response.status_code == 304:
+            cache._revalidated(url, cached)
+            return self.json_codec.loads(cached.body)
         self._check_api_response(response)
-        return response.json()
+        if cache is not None:
+            if cached is not None and (cached.etag or cached.last_modified):
+                cache._missed()
+            cache._put(url, template, response)
+        return self.json_codec.loads(response.content)
 
-    def upload_file(self, file: Union[BinaryIO, str]) -> FileToken:
+    def upload_file(
+        self,
+        file: Union[BinaryIO, str],
+        progress: Callable[[int, int], None] = None,
+        chunk_size: int = 64 * 1024,
+    ) -> FileToken:
         if isinstance(file, str):
             with open(file, "rb") as f:
-                return self.upload_file(f)
-        response = requests.post(
-            self._create_api_url(["uploads"]),
-            files={"content": file},
-            headers=self._api_headers,
-        )
+                return self.upload_file(f, progress, chunk_size)
+        url = self._create_api_url(["uploads"])
+        if _MultipartFileStream.supports(file):
+            # Stream the body in chunks instead of building it in memory, rewinding the
+            # file for every attempt
+            start = file.tell()
+            bodies = []
+
+            def build() -> Dict[str, Any]:
+                file.seek(start)
+                body = _MultipartFileStream("content", file, chunk_size, progress)
+                bodies.append(body)
+                return {
+                    "data": body,
+                    "headers": {**self._api_headers, "Content-Type": body.content_type},
+                }
+
+        else:
+            content = file.read()
+            filename = requests.utils.guess_filename(file) or "content"
+            bodies = [hashlib.sha1(content)]
+
+            def build() -> Dict[str, Any]:
+                return {
+                    "files": {"content": (filename, content)},
+                    "headers": self._api_headers,
+                }
+
+        # Uploads only create a temporary token, so they can be repeated freely
+        response, _ = self._send("POST", "uploads", url, build, idempotent=True)
         self._check_api_response(response)
         return FileToken(
-            response.json()["token"], file.name if hasattr(file, "name") else None
+            self.json_codec.loads(response.content)["token"],
+            file.name if hasattr(file, "name") else None,
+            bodies[-1].hexdigest(),
         )
 
     def _create_data_url(self, rel_url: str, override_base: bool = True) -> str:
@@ -0,0 +1,185 @@
+from typing import Callable, Dict, Iterable, List
+
+import asyncio
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from .api import SzurubooruHTTPError
+from .resource import Resource, ResourceNotSynchronized
+from .tag import Tag
+from .throttle import TokenBucket
+
+PushResult = namedtuple("PushResult", ["resource", "success", "attempts", "error"])
+
+_TRANSIENT_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+def _status_code(e: Exception) -> int:
+    if isinstance(e, SzurubooruHTTPError) and e.response is not None:
+        return e.response.status_code
+    return None
+
+
+def _is_transient(e: Exception) -> bool:
+    return (
+        isinstance(e, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+        or _status_code(e) in _TRANSIENT_STATUS_CODES
+    )
+
+
+def _is_conflict(e: Exception) -> bool:
+    return isinstance(e, ResourceNotSynchronized) or _status_code(e) == 409
+
+
+def _rebase(resource: Resource) -> None:
+    # Take the latest server state and re-apply the pending local changes on top of it
+    resource._commit_lists()
+    pending = dict(resource._json_new)
+    data = resource._api._call("GET", resource._get_instance_urlparts(), use_cache=False)
+    resource._update_json(data, force=True)
+    resource._json_new = pending
+
+
+def _push_one(
+    resource: Resource, retries: int, backoff: float, limiter: TokenBucket
+) -> PushResult:
+    resource._commit_lists()
+    if not resource._json_new:
+        return PushResult(resource, True, 0, None)
+    needs_rebase = False
+    attempt = 0
+    while True:
+        attempt += 1
+        if limiter:
+            limiter.acquire()
+        try:
+            if needs_rebase:
+                _rebase(resource)
+                needs_rebase = False
+            resource.push()
+            return PushResult(resource, True, attempt, None)
+        except Exception as e:
+            if attempt > retries:
+                return PushResult(resource, False, attempt, e)
+            if _is_conflict(e) and resource._json.get("version"):
+                needs_rebase = True
+            elif _is_transient(e):
+                time.sleep(backoff * 2 ** (attempt - 1))
+            else:
+                return PushResult(resource, False, attempt, e)
+
+
+def _push_all(
+    resources: Iterable[Resource],
+    workers: int = 8,
+    rate_limit: float = None,
+    retries: int = 3,
+    backoff: float = 0.5,
+) -> List[PushResult]:
+    """
+    Pushes modified resources concurrently, returning one PushResult per resource in
+    input order. Transient errors are retried with exponential backoff; version conflicts
+    are resolved by pulling the latest state and re-applying the pending changes.
+    rate_limit is the maximum number of push attempts per second across all workers.
+    """
+    limiter = TokenBucket(rate_limit, 1) if rate_limit else None
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(
+            executor.map(lambda r: _push_one(r, retries, backoff, limiter), resources)
+        )
+
+
+def _name_queries(cls: type, names: List[str], chunk_size: int) -> List[str]:
+    """Search queries matching any of the names, chunk_size names per query"""
+    prefix = "" if cls is Tag else "name:"
+    return [
+        prefix + Tag._identity_query(names[i : i + chunk_size])
+        for i in range(0, len(names), chunk_size)
+    ]
+
+
+def _unique_names(names: List[str]) -> Dict[str, str]:
+    # Names are case insensitive on the server, keep the first spelling of each
+    wanted = {}
+    for name in names:
+        if not isinstance(name, str):
+            raise ValueError("Names must be strings")
+        wanted.setdefault(name.lower(), name)
+    return wanted
+
+
+def _match(found: Dict[str, Resource], wanted: Dict[str, str], resource: Resource) -> None:
+    for name in resource.names:
+        if name.lower() in wanted:
+            found.setdefault(name.lower(), resource)
+
+
+def _get_or_create(
+    cls: type,
+    names: Iterable[str],
+    search: Callable[[str], Iterable[Resource]],
+    create: Callable[[str], Resource],
+    workers: int = 8,
+    chunk_size: int = 50,
+) -> Dict[str, Resource]:
+    """
+    Looks up the names with one search per chunk_size names and creates the missing
+    ones concurrently, returning a map of the given names to resources. A creation
+    rejected because another client created the name in the meantime is resolved by
+    searching for it again.
+    """
+    names = list(names)
+    wanted = _unique_names(names)
+    found = {}
+    for query in _name_queries(cls, list(wanted.values()), chunk_size):
+        for resource in search(query):
+            _match(found, wanted, resource)
+
+    def create_one(name: str) -> Resource:
+        try:
+            return create(name)
+        except SzurubooruHTTPError:
+            for resource in search(_name_queries(cls, [name], 1)[0]):
+                if name.lower() in (x.lower() for x in resource.names):
+                    return resource
+            raise
+
+    missing = [name for key, name in wanted.items() if key not in found]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for name, resource in zip(missing, executor.map(create_one, missing)):
+            found[name.lower()] = resource
+    return {name: found[name.lower()] for name in names}
+
+
+async def _get_or_create_async(
+    cls: type,
+    names: Iterable[str],
+    search: Callable,
+    create: Callable,
+    chunk_size: int = 50,
+) -> Dict[str, Resource]:
+    # See _get_or_create, creations run concurrently up to AsyncAPI's max_concurrency
+    names = list(names)
+    wanted = _unique_names(names)
+    found = {}
+    for query in _name_queries(cls, list(wanted.values()), chunk_size):
+        async for resource in search(query):
+            _match(found, wanted, resource)
+
+    async def create_one(name: str) -> Resource:
+        try:
+            return await create(name)
+        except SzurubooruHTTPError:
+            async for resource in search(_name_queries(cls, [name], 1)[0]):
+                if name.lower() in (x.lower() for x in resource.names):
+                    return resource
+            raise
+
+    missing = [name for key, name in wanted.items() if key not in found]
+    created = await asyncio.gather(*(create_one(x) for x in missing))
+    for name, resource in zip(missing, created):
+        found[name.lower()] = resource
+    return {name: found[name.lower()] for name in names}
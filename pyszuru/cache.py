@@ -0,0 +1,355 @@
+from typing import Any, Dict, Hashable, List, Optional, Set, Tuple
+
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+
+
+class _ResourceCache:
+    """
+    Identity map of resources, keyed by resource class and identifier (id or name),
+    with least-recently-used eviction and an optional time-to-live
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: Optional[float] = None):
+        self._max_size = max_size
+        self._ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _expiry(self) -> Optional[float]:
+        return time.monotonic() + self._ttl if self._ttl is not None else None
+
+    def get(self, cls: type, key: Hashable) -> Any:
+        with self._lock:
+            entry = self._entries.get((cls, key))
+            if entry is None:
+                return None
+            expiry, resource = entry
+            if expiry is not None and expiry < time.monotonic():
+                del self._entries[(cls, key)]
+                return None
+            self._entries.move_to_end((cls, key))
+            return resource
+
+    def add(self, resource, old_keys: List[Hashable] = ()) -> None:
+        if self._max_size <= 0:
+            return
+        cls = type(resource)
+        with self._lock:
+            for key in old_keys:
+                self._discard_key(cls, key, resource)
+            expiry = self._expiry()
+            for key in resource._cache_keys():
+                self._entries[(cls, key)] = (expiry, resource)
+                self._entries.move_to_end((cls, key))
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+
+    def discard(self, resource, keys: List[Hashable] = None) -> None:
+        cls = type(resource)
+        with self._lock:
+            for key in resource._cache_keys() if keys is None else keys:
+                self._discard_key(cls, key, resource)
+
+    def _discard_key(self, cls: type, key: Hashable, resource) -> None:
+        entry = self._entries.get((cls, key))
+        if entry is not None and entry[1] is resource:
+            del self._entries[(cls, key)]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class _CachedResponse:
+    __slots__ = ("body", "etag", "last_modified", "stored_at", "template")
+
+    def __init__(
+        self,
+        body: bytes,
+        etag: str,
+        last_modified: str,
+        stored_at: float,
+        template: str,
+    ):
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.stored_at = stored_at
+        self.template = template
+
+    def conditional_headers(self) -> Dict[str, str]:
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class _MemoryStore:
+    def __init__(self):
+        self._entries = OrderedDict()
+
+    def get(self, url: str) -> Optional[_CachedResponse]:
+        entry = self._entries.get(url)
+        if entry is not None:
+            self._entries.move_to_end(url)
+        return entry
+
+    def put(self, url: str, entry: _CachedResponse) -> None:
+        self._entries[url] = entry
+        self._entries.move_to_end(url)
+
+    def delete(self, url: str) -> None:
+        self._entries.pop(url, None)
+
+    def oldest(self) -> Optional[str]:
+        return next(iter(self._entries), None)
+
+    def index(self) -> List[Tuple[str, int, str]]:
+        """URL, body size and URL template of every entry"""
+        return [(url, len(x.body), x.template) for url, x in self._entries.items()]
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+class _SQLiteStore:
+    def __init__(self, path: str):
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._db:
+            columns = [x[1] for x in self._db.execute("PRAGMA table_info(responses)")]
+            if columns and "template" not in columns:
+                # Written by an earlier version, entries cannot be invalidated by family
+                self._db.execute("DROP TABLE responses")
+            self._db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS responses (
+                    url TEXT PRIMARY KEY,
+                    body BLOB NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT,
+                    stored_at REAL NOT NULL,
+                    used_at REAL NOT NULL,
+                    template TEXT NOT NULL
+                )
+                """
+            )
+
+    def get(self, url: str) -> Optional[_CachedResponse]:
+        row = self._db.execute(
+            "SELECT body, etag, last_modified, stored_at, template FROM responses "
+            "WHERE url = ?",
+            (url,),
+        ).fetchone()
+        if row is None:
+            return None
+        with self._db:
+            self._db.execute(
+                "UPDATE responses SET used_at = ? WHERE url = ?", (time.time(), url)
+            )
+        return _CachedResponse(*row)
+
+    def put(self, url: str, entry: _CachedResponse) -> None:
+        with self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    url,
+                    entry.body,
+                    entry.etag,
+                    entry.last_modified,
+                    entry.stored_at,
+                    time.time(),
+                    entry.template,
+                ),
+            )
+
+    def delete(self, url: str) -> None:
+        with self._db:
+            self._db.execute("DELETE FROM responses WHERE url = ?", (url,))
+
+    def oldest(self) -> Optional[str]:
+        row = self._db.execute(
+            "SELECT url FROM responses ORDER BY used_at LIMIT 1"
+        ).fetchone()
+        return row[0] if row else None
+
+    def index(self) -> List[Tuple[str, int, str]]:
+        return self._db.execute(
+            "SELECT url, length(body), template FROM responses"
+        ).fetchall()
+
+    def clear(self) -> None:
+        with self._db:
+            self._db.execute("DELETE FROM responses")
+
+
+# Endpoints showing the same kind of resource
+_FAMILIES = {
+    "post": "posts",
+    "posts": "posts",
+    "tag": "tags",
+    "tags": "tags",
+    "tag-merge": "tags",
+    "pool": "pools",
+    "pools": "pools",
+    "pool-merge": "pools",
+}
+
+# Families whose responses a write to a family can change: posts carry their tags and
+# pools, writing a post creates tags and changes their usage counts, and pools carry
+# their posts
+_INVALIDATES = {
+    "posts": ("posts", "tags", "pools"),
+    "tags": ("tags", "posts"),
+    "pools": ("pools", "posts"),
+}
+
+# Requests other than GET that do not change anything on the server
+_QUERIES = ("posts/reverse-search",)
+
+
+def _family(template: str) -> str:
+    first = template.partition("/")[0]
+    return _FAMILIES.get(first, first)
+
+
+class ResponseCache:
+    """
+    Cache of GET responses for an API instance. A response is served locally for ttl
+    seconds after it was stored; after that, it is revalidated with If-None-Match or
+    If-Modified-Since if the server sent an ETag or Last-Modified header, and fetched
+    again otherwise. endpoints overrides ttl per URL template (e.g. "post/{id}") or
+    first path part (e.g. "tag-categories"), with None disabling caching there.
+    Bodies are kept up to max_bytes in total, evicting the least recently used, in
+    memory or in a SQLite file at path. Requests other than GET drop the cached
+    responses of the kind of resource they write (e.g. post/{id} and posts for a post),
+    and of the kinds embedding it.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 32 * 1024 * 1024,
+        ttl: float = 0,
+        endpoints: Dict[str, Optional[float]] = None,
+        path: str = None,
+    ):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.endpoints = endpoints or {}
+        self._store = _SQLiteStore(path) if path else _MemoryStore()
+        self._sizes = {}
+        self._total_bytes = 0
+        self._families: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.revalidations = 0
+        self.misses = 0
+        self.evictions = 0
+        for url, size, template in self._store.index():
+            self._index(url, size, template)
+
+    def _index(self, url: str, size: int, template: str) -> None:
+        self._sizes[url] = size
+        self._total_bytes += size
+        self._families.setdefault(_family(template), set()).add(url)
+
+    def _unindex(self, url: str) -> None:
+        size = self._sizes.pop(url, None)
+        if size is None:
+            return
+        self._total_bytes -= size
+        for family, urls in list(self._families.items()):
+            if url in urls:
+                urls.discard(url)
+                if not urls:
+                    del self._families[family]
+
+    def _ttl_for(self, template: str) -> Optional[float]:
+        if template in self.endpoints:
+            return self.endpoints[template]
+        return self.endpoints.get(template.partition("/")[0], self.ttl)
+
+    def _lookup(self, url: str, template: str) -> Tuple[Optional[_CachedResponse], bool]:
+        """Cached response for url, and whether it can be used without revalidating"""
+        ttl = self._ttl_for(template)
+        if ttl is None:
+            return None, False
+        with self._lock:
+            entry = self._store.get(url)
+            fresh = entry is not None and time.time() - entry.stored_at < ttl
+            if fresh:
+                self.hits += 1
+            elif entry is None or not (entry.etag or entry.last_modified):
+                self.misses += 1
+            return entry, fresh
+
+    def _missed(self) -> None:
+        with self._lock:
+            self.misses += 1
+
+    def _revalidated(self, url: str, entry: _CachedResponse) -> None:
+        with self._lock:
+            self.revalidations += 1
+            entry.stored_at = time.time()
+            self._store.put(url, entry)
+
+    def _put(self, url: str, template: str, response: requests.models.Response) -> None:
+        ttl = self._ttl_for(template)
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if ttl is None or not (ttl > 0 or etag or last_modified):
+            return
+        body = response.content
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            self._unindex(url)
+            self._store.put(
+                url, _CachedResponse(body, etag, last_modified, time.time(), template)
+            )
+            self._index(url, len(body), template)
+            while self._total_bytes > self.max_bytes:
+                oldest = self._store.oldest()
+                self._store.delete(oldest)
+                self._unindex(oldest)
+                self.evictions += 1
+
+    def invalidate(self, template: str) -> None:
+        """Drops the cached responses a write to the URL template can change"""
+        if template in _QUERIES:
+            return
+        family = _family(template)
+        with self._lock:
+            for changed in _INVALIDATES.get(family, (family,)):
+                for cached_url in list(self._families.get(changed, ())):
+                    self._store.delete(cached_url)
+                    self._unindex(cached_url)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._store.clear()
+            self._sizes.clear()
+            self._total_bytes = 0
+            self._families.clear()
+
+    @property
+    def hit_rate(self) -> float:
+        """Share of cacheable requests answered from the cache, locally or with a 304"""
+        requests_ = self.hits + self.revalidations + self.misses
+        return (self.hits + self.revalidations) / requests_ if requests_ else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.hits} hits, {self.revalidations} revalidated, {self.misses} misses, "
+            f"{self.evictions} evictions ({self.hit_rate:.0%} hit rate)"
+        )
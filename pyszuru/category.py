@@ -0,0 +1,72 @@
+from typing import Any, Dict, List
+
+import threading
+import time
+
+
+class CategoryRegistry:
+    """
+    Tag or pool categories of the server, loaded on first use and kept for ttl seconds
+    or until refresh() is called. Category names are validated against it locally;
+    an unknown name triggers one reload in case the category was created since.
+    """
+
+    def __init__(self, api, kind: str, ttl: float = 600):
+        if kind not in ("tag", "pool"):
+            raise ValueError("kind must be tag or pool")
+        self._api = api
+        self._kind = kind
+        self.ttl = ttl
+        self._categories = None
+        self._default = None
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def refresh(self) -> None:
+        results = self._api._call("GET", [f"{self._kind}-categories"])["results"]
+        default = [x["name"] for x in results if x["default"]]
+        if len(default) != 1:
+            raise ValueError(f"Server has {len(default)} default {self._kind} categories")
+        with self._lock:
+            self._categories = {x["name"].lower(): x for x in results}
+            self._default = default[0]
+            self._loaded_at = time.monotonic()
+
+    def invalidate(self) -> None:
+        """Reload the categories the next time they are used"""
+        self._loaded_at = None
+
+    def _loaded(self) -> Dict[str, Dict[str, Any]]:
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl:
+            self.refresh()
+        return self._categories
+
+    @property
+    def default(self) -> str:
+        self._loaded()
+        return self._default
+
+    @property
+    def names(self) -> List[str]:
+        return [x["name"] for x in self._loaded().values()]
+
+    def get(self, name: str) -> Dict[str, Any]:
+        """JSON of the named category (name, color, order, usages, default)"""
+        return self._loaded()[self.validate(name).lower()]
+
+    def validate(self, name: str) -> str:
+        """Returns the category name as spelled on the server, or raises ValueError"""
+        if not isinstance(name, str):
+            raise ValueError(f"{self._kind.capitalize()} category must be a string")
+        if name.lower() not in self._loaded():
+            self.refresh()
+            if name.lower() not in self._categories:
+                raise ValueError(f"Unknown {self._kind} category: {name}")
+        return self._categories[name.lower()]["name"]
+
+    def __contains__(self, name: str) -> bool:
+        try:
+            self.validate(name)
+            return True
+        except ValueError:
+            return False
@@ -0,0 +1,119 @@
+from typing import Iterable, List, Tuple
+
+import hashlib
+import os
+import threading
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+from .api import API, SzurubooruHTTPError
+from .bulk import _is_transient
+from .resource import _hydrate
+from .stats import TransferStats
+
+
+class DownloadStats(TransferStats):
+    _verb = "downloaded"
+
+
+def _sha1_of(path: str, chunk_size: int) -> str:
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _download_file(
+    api: API,
+    url: str,
+    path: str,
+    checksum: str = None,
+    chunk_size: int = 64 * 1024,
+) -> Tuple[int, bool]:
+    """
+    Streams url to path, returning the number of bytes received and whether the
+    download was skipped because path already matches the SHA1 checksum. A partial
+    download left at path + ".part" is resumed with a Range request.
+    """
+    if checksum and os.path.isfile(path) and _sha1_of(path, chunk_size) == checksum:
+        return 0, True
+
+    part_path = f"{path}.part"
+    offset = os.path.getsize(part_path) if os.path.isfile(part_path) else 0
+    headers = {k: v for k, v in api._api_headers.items() if k == "Authorization"}
+    if offset:
+        headers["Range"] = f"bytes={offset}-"
+    received = 0
+    with api._request("GET", "data/{path}", url, headers=headers, stream=True) as response:
+        if response.status_code == 416:
+            # Partial file is already complete (or larger than the remote file)
+            response.close()
+        elif response.status_code not in (200, 206):
+            raise SzurubooruHTTPError(
+                f"Download of {url} failed with status {response.status_code}",
+                response=response,
+            )
+        else:
+            mode = "ab" if response.status_code == 206 else "wb"
+            with open(part_path, mode) as f:
+                for chunk in response.iter_content(chunk_size):
+                    f.write(chunk)
+                    received += len(chunk)
+
+    if checksum and _sha1_of(part_path, chunk_size) != checksum:
+        os.remove(part_path)
+        raise SzurubooruHTTPError(f"Checksum mismatch for download of {url}")
+    os.replace(part_path, path)
+    return received, False
+
+
+def _download_posts(
+    api: API,
+    posts: Iterable,  # posts: Iterable[Post]
+    dest_dir: str,
+    workers: int = 4,
+    chunk_size: int = 64 * 1024,
+    batch_size: int = 100,
+) -> DownloadStats:
+    stats = DownloadStats()
+    os.makedirs(dest_dir, exist_ok=True)
+    in_flight = threading.BoundedSemaphore(workers * 2)
+
+    def run(post) -> None:
+        try:
+            _, received, skipped = post._download(dest_dir, chunk_size)
+        except Exception as e:
+            stats._record(0, error=e, item=post)
+        else:
+            stats._record(received, skipped=skipped)
+        finally:
+            in_flight.release()
+
+    def submit(batch: List) -> None:
+        # Search results carry neither field, so they are fetched per batch instead of
+        # with one request per post
+        try:
+            _hydrate(api, batch, ["checksum", "contentUrl"], batch_size)
+        except Exception as e:
+            if not _is_transient(e):
+                raise
+            # Posts left without the fields load them on their own
+        for post in batch:
+            in_flight.acquire()
+            executor.submit(run, post)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        batch = []
+        for post in posts:
+            batch.append(post)
+            if len(batch) >= batch_size:
+                submit(batch)
+                batch = []
+        submit(batch)
+    stats._finish()
+    return stats
+
+
+def _filename_for_url(url: str) -> str:
+    return os.path.basename(urllib.parse.urlsplit(url).path)
@@ -0,0 +1,119 @@
+from typing import Iterable, Iterator, Set, Union
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .stats import TransferStats
+
+
+class ImportStats(TransferStats):
+    _verb = "imported"
+
+
+class _InFlightBudget:
+    def __init__(self, max_bytes: int, max_files: int):
+        self._max_bytes = max_bytes
+        self._max_files = max_files
+        self._bytes = 0
+        self._files = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, size: int) -> int:
+        # A file larger than the whole budget is let through once nothing else is running
+        size = min(size, self._max_bytes)
+        with self._cond:
+            self._cond.wait_for(
+                lambda: self._files < self._max_files
+                and self._bytes + size <= self._max_bytes
+            )
+            self._bytes += size
+            self._files += 1
+        return size
+
+    def release(self, size: int) -> None:
+        with self._cond:
+            self._bytes -= size
+            self._files -= 1
+            self._cond.notify_all()
+
+
+class _Journal:
+    """Append-only record of imported files, used to resume an interrupted import"""
+
+    def __init__(self, path: str):
+        self._path = path
+        self._lock = threading.Lock()
+
+    def completed(self) -> Set[str]:
+        if not os.path.exists(self._path):
+            return set()
+        with open(self._path, "r", encoding="utf-8") as f:
+            return {line.split("\t", 1)[0] for line in f if line.strip()}
+
+    def record(self, path: str, result: str) -> None:
+        with self._lock:
+            with open(self._path, "a", encoding="utf-8") as f:
+                f.write(f"{path}\t{result}\n")
+
+
+def _walk(source: Union[str, Iterable[str]]) -> Iterator[str]:
+    if isinstance(source, str):
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            for name in sorted(files):
+                yield os.path.join(root, name)
+    else:
+        yield from source
+
+
+def _import_one(api, path: str, safety: str, skip_duplicates: bool) -> str:
+    token = api.upload_file(path)
+    if skip_duplicates:
+        exact = [x for x in api.search_by_image(token) if x.exact]
+        if exact:
+            return f"duplicate:{exact[0].post.id_}"
+    return str(api.createPost(token, safety).id_)
+
+
+def _import_files(
+    api,
+    source: Union[str, Iterable[str]],
+    safety: str = "safe",
+    workers: int = 4,
+    max_inflight_bytes: int = 64 * 1024 * 1024,
+    skip_duplicates: bool = False,
+    journal_path: str = None,
+) -> ImportStats:
+    """
+    Uploads files from a directory or an iterable of paths and creates a post for each,
+    with up to `workers` files in flight and at most max_inflight_bytes being uploaded
+    at once. With a journal_path, files already recorded in the journal are skipped, so
+    an interrupted import can be resumed by running it again.
+    """
+    stats = ImportStats()
+    budget = _InFlightBudget(max_inflight_bytes, workers * 2)
+    journal = _Journal(journal_path) if journal_path else None
+    completed = journal.completed() if journal else set()
+
+    def run(path: str, size: int, reserved: int) -> None:
+        try:
+            result = _import_one(api, path, safety, skip_duplicates)
+        except Exception as e:
+            stats._record(size, error=e, item=path)
+            return
+        finally:
+            budget.release(reserved)
+        if journal:
+            journal.record(path, result)
+        stats._record(size, skipped=result.startswith("duplicate:"))
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for path in _walk(source):
+            if path in completed:
+                continue
+            size = os.path.getsize(path)
+            reserved = budget.acquire(size)
+            executor.submit(run, path, size, reserved)
+    stats._finish()
+    return stats
@@ -0,0 +1,180 @@
+from typing import Dict, List, Optional, Tuple
+
+import bisect
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+
+RequestInfo = namedtuple("RequestInfo", ["method", "template", "url", "lazy"])
+RequestEvent = namedtuple(
+    "RequestEvent",
+    [
+        "method",
+        "template",
+        "url",
+        "status",
+        "bytes_sent",
+        "bytes_received",
+        "duration",
+        "error",
+        "lazy",
+    ],
+)
+
+# Property whose lazy load caused the requests made on the current thread, if any
+_lazy_source = threading.local()
+
+
+@contextmanager
+def _lazy_load(resource, property_name: str):
+    previous = getattr(_lazy_source, "value", None)
+    _lazy_source.value = previous or f"{type(resource).__name__}.{property_name}"
+    try:
+        yield
+    finally:
+        _lazy_source.value = previous
+
+
+def _current_lazy_source() -> Optional[str]:
+    return getattr(_lazy_source, "value", None)
+
+
+# Resource kinds whose URLs continue with the identifier of a single resource. Other
+# paths, such as posts/reverse-search, are fixed endpoints and kept as they are.
+_IDENTIFIERS = {
+    "post": "{id}",
+    "pool": "{id}",
+    "comment": "{id}",
+    "tag": "{name}",
+    "user": "{name}",
+    "tag-category": "{name}",
+    "pool-category": "{name}",
+}
+
+
+def _url_template(urlparts: List[str]) -> str:
+    """Path of an API URL with identifiers replaced, e.g. ["post", 1] -> post/{id}"""
+    parts = [str(x) for x in urlparts]
+    identifier = _IDENTIFIERS.get(parts[0]) if len(parts) > 1 else None
+    if identifier is None:
+        return "/".join(parts)
+    return "/".join([parts[0], identifier, *parts[2:]])
+
+
+class _EndpointMetrics:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.count = 0
+        self.errors = 0
+        self.total_duration = 0.0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.bucket_counts = [0] * (len(buckets) + 1)
+
+
+class MetricsCollector:
+    """
+    In-memory latency histograms and counters per method and URL template, fed by
+    registering record() as an after-request hook:
+
+        collector = MetricsCollector()
+        api.add_request_hook(after=collector.record)
+
+    Requests made while lazily loading a property are also counted per property in
+    lazy_loads, which points at properties read in a loop without being prefetched.
+    """
+
+    default_buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, buckets: Tuple[float, ...] = default_buckets):
+        self.buckets = tuple(sorted(buckets))
+        self.endpoints: Dict[Tuple[str, str], _EndpointMetrics] = {}
+        self.lazy_loads: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def record(self, event: RequestEvent) -> None:
+        key = (event.method, event.template)
+        with self._lock:
+            metrics = self.endpoints.get(key)
+            if metrics is None:
+                metrics = self.endpoints[key] = _EndpointMetrics(self.buckets)
+            metrics.count += 1
+            metrics.errors += event.error is not None or event.status >= 400
+            metrics.total_duration += event.duration
+            metrics.bytes_sent += event.bytes_sent or 0
+            metrics.bytes_received += event.bytes_received or 0
+            metrics.bucket_counts[bisect.bisect_left(self.buckets, event.duration)] += 1
+            if event.lazy:
+                self.lazy_loads[event.lazy] = self.lazy_loads.get(event.lazy, 0) + 1
+
+    def quantile(self, method: str, template: str, q: float) -> Optional[float]:
+        """Upper bound of the histogram bucket holding the q-quantile of latency"""
+        metrics = self.endpoints.get((method, template))
+        if metrics is None or not metrics.count:
+            return None
+        rank = q * metrics.count
+        seen = 0
+        for bound, count in zip(self.buckets + (float("inf"),), metrics.bucket_counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def reset(self) -> None:
+        with self._lock:
+            self.endpoints.clear()
+            self.lazy_loads.clear()
+
+    @staticmethod
+    def _labels(**labels) -> str:
+        escaped = (
+            (k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+            for k, v in labels.items()
+        )
+        return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+    def to_prometheus(self, prefix: str = "pyszuru") -> str:
+        """Metrics in the Prometheus text exposition format"""
+        lines = [
+            f"# HELP {prefix}_request_duration_seconds Duration of API requests",
+            f"# TYPE {prefix}_request_duration_seconds histogram",
+        ]
+        with self._lock:
+            endpoints = sorted(self.endpoints.items())
+            lazy_loads = sorted(self.lazy_loads.items())
+        for (method, template), metrics in endpoints:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), metrics.bucket_counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                labels = self._labels(method=method, endpoint=template, le=le)
+                lines.append(
+                    f"{prefix}_request_duration_seconds_bucket{labels} {cumulative}"
+                )
+            labels = self._labels(method=method, endpoint=template)
+            lines.append(
+                f"{prefix}_request_duration_seconds_sum{labels} {metrics.total_duration}"
+            )
+            lines.append(f"{prefix}_request_duration_seconds_count{labels} {metrics.count}")
+        for name, help_text, attribute in (
+            ("request_errors_total", "API requests that failed", "errors"),
+            ("request_bytes_sent_total", "Bytes sent in API request bodies", "bytes_sent"),
+            (
+                "request_bytes_received_total",
+                "Bytes received in API response bodies",
+                "bytes_received",
+            ),
+        ):
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} counter")
+            for (method, template), metrics in endpoints:
+                labels = self._labels(method=method, endpoint=template)
+                lines.append(f"{prefix}_{name}{labels} {getattr(metrics, attribute)}")
+        lines.append(
+            f"# HELP {prefix}_lazy_loads_total Requests made by lazy property loads"
+        )
+        lines.append(f"# TYPE {prefix}_lazy_loads_total counter")
+        for source, count in lazy_loads:
+            lines.append(
+                f"{prefix}_lazy_loads_total{self._labels(property=source)} {count}"
+            )
+        return "\n".join(lines) + "\n"
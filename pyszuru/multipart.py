@@ -0,0 +1,84 @@
+from typing import BinaryIO, Callable, Iterator, Optional
+
+import hashlib
+import os
+import uuid
+
+
+class _MultipartFileStream:
+    """
+    File-like multipart/form-data body holding a single file field. The file is read in
+    chunk_size pieces as the body is sent, so memory use does not depend on file size.
+    """
+
+    def __init__(
+        self,
+        field_name: str,
+        file: BinaryIO,
+        chunk_size: int = 64 * 1024,
+        progress: Callable[[int, int], None] = None,
+    ):
+        boundary = uuid.uuid4().hex
+        filename = os.path.basename(getattr(file, "name", None) or field_name)
+        filename = str(filename).replace('"', "%22")
+        self.content_type = f"multipart/form-data; boundary={boundary}"
+        self._head = (
+            f"--{boundary}\r\n"
+            f'Content-Disposition: form-data; name="{field_name}"; filename="{filename}"\r\n'
+            f"Content-Type: application/octet-stream\r\n\r\n"
+        ).encode("utf-8")
+        self._tail = f"\r\n--{boundary}--\r\n".encode("utf-8")
+        self._file = file
+        self._chunk_size = chunk_size
+        self._progress = progress
+        self._file_remaining = self._remaining_size(file)
+        self.len = len(self._head) + self._file_remaining + len(self._tail)
+        self._sent = 0
+        self._sha1 = hashlib.sha1()
+
+    @staticmethod
+    def _remaining_size(file: BinaryIO) -> Optional[int]:
+        try:
+            position = file.tell()
+            end = file.seek(0, os.SEEK_END)
+            file.seek(position)
+            return end - position
+        except (AttributeError, OSError, ValueError):
+            return None
+
+    @classmethod
+    def supports(cls, file: BinaryIO) -> bool:
+        """Whether the size of the file can be known up front (i.e. it is seekable)"""
+        return cls._remaining_size(file) is not None
+
+    def hexdigest(self) -> str:
+        """SHA1 of the file content sent so far"""
+        return self._sha1.hexdigest()
+
+    def __len__(self) -> int:
+        return self.len
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            size = self._chunk_size
+        if self._head:
+            data, self._head = self._head[:size], self._head[size:]
+        elif self._file_remaining:
+            data = self._file.read(min(size, self._chunk_size, self._file_remaining))
+            if not data:
+                raise OSError("File was truncated while uploading")
+            self._file_remaining -= len(data)
+            self._sha1.update(data)
+        else:
+            data, self._tail = self._tail[:size], self._tail[size:]
+        self._sent += len(data)
+        if self._progress and data:
+            self._progress(self._sent, self.len)
+        return data
+
+    def __iter__(self) -> Iterator[bytes]:
+        while True:
+            data = self.read(self._chunk_size)
+            if not data:
+                return
+            yield data
@@ -1,7 +1,8 @@
-from typing import Any, Callable, Dict, List
+from typing import Any, Callable, Dict, List, Optional
 
 from .post import Post
 from .resource import Resource, _ResourceList
+from .tag import Tag
 
 
 class Pool(Resource):
@@ -17,14 +18,16 @@ class Pool(Resource):
     def _lazy_load_components(cls) -> List[str]:
         return ["id", "names", "category", "description", "postCount"]
 
-    def _setter_transforms(self) -> Dict[str, Callable]:
+    @classmethod
+    def _setter_transforms(cls) -> Dict[str, Callable]:
         return {
             "posts": lambda x: {"id": x.id_},
         }
 
-    def _getter_transforms(self) -> Dict[str, Callable]:
+    @classmethod
+    def _getter_transforms(cls) -> Dict[str, Callable]:
         return {
-            "posts": lambda x: Post(self._api, x),
+            "posts": Post._from_cache,
         }
 
     def _serialized(self) -> Dict[str, Any]:
@@ -33,6 +36,22 @@ class Pool(Resource):
             ret["posts"] = [x["id"] for x in ret["posts"]]
         return ret
 
+    def _create_reconciler(self) -> Optional[Callable[[], Optional[Dict[str, Any]]]]:
+        names = self._json_new.get("names")
+        if not names:
+            return None
+
+        def find() -> Optional[Dict[str, Any]]:
+            page = self._api._call(
+                "GET",
+                ["pools"],
+                urlquery={"query": f"name:{Tag._escape_name(names[0])}", "limit": 1},
+                use_cache=False,
+            )
+            return page["results"][0] if page["results"] else None
+
+        return find
+
     # Getters and Setters
     @property
     def id_(self) -> int:
@@ -56,7 +75,7 @@ class Pool(Resource):
 
     @category.setter
     def category(self, val: str) -> None:
-        self._generic_setter("category", val)
+        self._generic_setter("category", self._api.pool_categories.validate(val))
 
     @property
     def description(self) -> str:
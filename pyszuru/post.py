@@ -1,8 +1,10 @@
-from typing import Any, Callable, Dict, List, Union
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 
+import os
 from collections import namedtuple
 
 from .api import FileToken
+from .download import _download_file, _filename_for_url
 from .resource import Resource, _ResourceList
 from .tag import Tag
 
@@ -28,16 +30,14 @@ class PostNote:
 
 
 class Post(Resource):
+    # SHA1 of the content of a post being created, used to find it after a failed push
+    _content_checksum = None
+
     @staticmethod
     def _validate_safety(safety: str) -> None:
         if safety not in ("safe", "sketchy", "unsafe"):
             raise ValueError("Safety must be of value safe, sketchy, or unsafe")
 
-    def _str_to_tag(self, val: str) -> Tag:
-        t = Tag(self._api, {"names": [val]})
-        t.pull()
-        return t
-
     # Implementing Abstract Methods
     def _get_instance_urlparts(self) -> List[str]:
         return ["post", str(self._json["id"])]
@@ -50,16 +50,18 @@ class Post(Resource):
     def _lazy_load_components(cls) -> List[str]:
         return ["id", "safety", "type", "contentUrl", "flags", "tags", "relations"]
 
-    def _setter_transforms(self) -> Dict[str, Callable]:
+    @classmethod
+    def _setter_transforms(cls) -> Dict[str, Callable]:
         return {
-            "tags": lambda x: {"names": x.names, "category": x.category},
+            "tags": lambda x: {"names": list(x.names), "category": x.category},
             "relations": lambda x: {"id": x.id_},
         }
 
-    def _getter_transforms(self) -> Dict[str, Callable]:
+    @classmethod
+    def _getter_transforms(cls) -> Dict[str, Callable]:
         return {
-            "tags": lambda x: Tag(self._api, x),
-            "relations": lambda x: Post(self._api, x),
+            "tags": Tag._from_cache,
+            "relations": Post._from_cache,
         }
 
     def _serialized(self) -> Dict[str, Any]:
@@ -81,6 +83,39 @@ class Post(Resource):
             ret["relations"] = [post["id"] for post in ret["relations"]]
         return ret
 
+    def _create_reconciler(self) -> Optional[Callable[[], Optional[Dict[str, Any]]]]:
+        if not self._content_checksum:
+            return None
+
+        def find() -> Optional[Dict[str, Any]]:
+            page = self._api._call(
+                "GET",
+                ["posts"],
+                urlquery={
+                    "query": f"content-checksum:{self._content_checksum}",
+                    "limit": 1,
+                },
+                use_cache=False,
+            )
+            return page["results"][0] if page["results"] else None
+
+        return find
+
+    def _download(self, path: str, chunk_size: int) -> Tuple[str, int, bool]:
+        url = self.content
+        if os.path.isdir(path):
+            path = os.path.join(path, _filename_for_url(url))
+        received, skipped = _download_file(self._api, url, path, self.checksum, chunk_size)
+        return path, received, skipped
+
+    def download(self, path: str, chunk_size: int = 64 * 1024) -> str:
+        """
+        Downloads the content of this post to path (or into path, if it is a directory)
+        and returns the file path. Files that already match the post checksum are not
+        downloaded again, and interrupted downloads are resumed.
+        """
+        return self._download(path, chunk_size)[0]
+
     # Getters and Setters
     @property
     def id_(self) -> int:
@@ -121,9 +156,7 @@ class Post(Resource):
 
     @tags.setter
     def tags(self, val: List[Union[Tag, str]]) -> None:
-        self._generic_setter(
-            "tags", [self._str_to_tag(x) if isinstance(x, str) else x for x in val]
-        )
+        self._generic_setter("tags", Tag._from_names(self._api, val))
 
     @property
     def relations(self) -> List:  # -> List[Post]
@@ -0,0 +1,254 @@
+from typing import Any, Dict, List, Tuple
+
+import sys
+
+from .api import API
+from .pool import Pool
+from .post import Post
+from .tag import Tag
+
+
+def _intern(value: str) -> str:
+    return sys.intern(value) if value is not None else None
+
+
+def _intern_all(values: List[str]) -> Tuple[str, ...]:
+    return tuple(sys.intern(x) for x in values)
+
+
+class TagRecord:
+    """
+    Read-only, compact counterpart of Tag holding only the fields returned by a search
+    """
+
+    __slots__ = ("_api", "_names", "_category", "_usages")
+
+    def __init__(self, api: API, names: Tuple[str, ...], category: str, usages: int):
+        self._api = api
+        self._names = names
+        self._category = category
+        self._usages = usages
+
+    @classmethod
+    def _from_json(cls, api: API, data: Dict[str, Any], table: Dict):
+        names = _intern_all(data["names"])
+        category = _intern(data.get("category"))
+        key = (names, category, data.get("usages"))
+        record = table.get(key)
+        if record is None:
+            record = table[key] = cls(api, names, category, data.get("usages"))
+        return record
+
+    @property
+    def names(self) -> Tuple[str, ...]:
+        return self._names
+
+    @property
+    def category(self) -> str:
+        return self._category
+
+    @property
+    def usages(self) -> int:
+        return self._usages
+
+    @property
+    def primary_name(self) -> str:
+        return self.names[0]
+
+    def to_resource(self) -> Tag:
+        return Tag(
+            self._api,
+            {"names": list(self.names), "category": self.category, "usages": self.usages},
+        )
+
+    def __str__(self) -> str:
+        return self.primary_name
+
+    def __repr__(self) -> str:
+        return f"{self._api!r}.<TagRecord of name '{self.primary_name}'>"
+
+
+class PostRecord:
+    """
+    Read-only, compact counterpart of Post holding only the fields returned by a search.
+    Tag records are shared between posts and strings are interned.
+    """
+
+    __slots__ = (
+        "_api",
+        "_id",
+        "_safety",
+        "_type",
+        "_content_url",
+        "_flags",
+        "_tags",
+        "_relation_ids",
+    )
+
+    def __init__(
+        self,
+        api: API,
+        id_: int,
+        safety: str,
+        type_: str,
+        content_url: str,
+        flags: Tuple[str, ...],
+        tags: Tuple[TagRecord, ...],
+        relation_ids: Tuple[int, ...],
+    ):
+        self._api = api
+        self._id = id_
+        self._safety = safety
+        self._type = type_
+        self._content_url = content_url
+        self._flags = flags
+        self._tags = tags
+        self._relation_ids = relation_ids
+
+    @classmethod
+    def _from_json(cls, api: API, data: Dict[str, Any], table: Dict):
+        return cls(
+            api,
+            data["id"],
+            _intern(data.get("safety")),
+            _intern(data.get("type")),
+            data.get("contentUrl"),
+            _intern_all(data.get("flags") or ()),
+            tuple(TagRecord._from_json(api, x, table) for x in data.get("tags") or ()),
+            tuple(x["id"] for x in data.get("relations") or ()),
+        )
+
+    @property
+    def id_(self) -> int:
+        return self._id
+
+    @property
+    def safety(self) -> str:
+        return self._safety
+
+    @property
+    def type_(self) -> str:
+        return self._type
+
+    @property
+    def tags(self) -> Tuple[TagRecord, ...]:
+        return self._tags
+
+    @property
+    def relations(self) -> Tuple[Post, ...]:
+        return tuple(Post._from_cache(self._api, {"id": x}) for x in self._relation_ids)
+
+    @property
+    def content(self) -> str:
+        return self._api._create_data_url(self._content_url)
+
+    @property
+    def loop(self) -> bool:
+        return "loop" in self._flags
+
+    @property
+    def sound(self) -> bool:
+        return "sound" in self._flags
+
+    def to_resource(self) -> Post:
+        return Post(
+            self._api,
+            {
+                "id": self.id_,
+                "safety": self.safety,
+                "type": self.type_,
+                "contentUrl": self._content_url,
+                "flags": list(self._flags),
+                "tags": [
+                    {"names": list(t.names), "category": t.category, "usages": t.usages}
+                    for t in self.tags
+                ],
+                "relations": [{"id": x} for x in self._relation_ids],
+            },
+        )
+
+    def __str__(self) -> str:
+        return f"Post {self.id_}"
+
+    def __repr__(self) -> str:
+        return f"{self._api!r}.<PostRecord of id {self.id_}>"
+
+
+class PoolRecord:
+    """
+    Read-only, compact counterpart of Pool holding only the fields returned by a search
+    """
+
+    __slots__ = ("_api", "_id", "_names", "_category", "_description", "_post_count")
+
+    def __init__(
+        self,
+        api: API,
+        id_: int,
+        names: Tuple[str, ...],
+        category: str,
+        description: str,
+        post_count: int,
+    ):
+        self._api = api
+        self._id = id_
+        self._names = names
+        self._category = category
+        self._description = description
+        self._post_count = post_count
+
+    @classmethod
+    def _from_json(cls, api: API, data: Dict[str, Any], table: Dict):
+        return cls(
+            api,
+            data["id"],
+            _intern_all(data["names"]),
+            _intern(data.get("category")),
+            data.get("description"),
+            data.get("postCount"),
+        )
+
+    @property
+    def id_(self) -> int:
+        return self._id
+
+    @property
+    def names(self) -> Tuple[str, ...]:
+        return self._names
+
+    @property
+    def category(self) -> str:
+        return self._category
+
+    @property
+    def description(self) -> str:
+        return self._description
+
+    @property
+    def postCount(self) -> int:
+        return self._post_count
+
+    @property
+    def primary_name(self) -> str:
+        return self.names[0]
+
+    def to_resource(self) -> Pool:
+        return Pool(
+            self._api,
+            {
+                "id": self.id_,
+                "names": list(self.names),
+                "category": self.category,
+                "description": self.description,
+                "postCount": self.postCount,
+            },
+        )
+
+    def __str__(self) -> str:
+        return self.primary_name
+
+    def __repr__(self) -> str:
+        return f"{self._api!r}.<PoolRecord of name '{self.primary_name}'>"
+
+
+_record_classes = {Post: PostRecord, Tag: TagRecord, Pool: PoolRecord}
@@ -1,8 +1,10 @@
-from typing import Any, Callable, Dict, List
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
 
 from collections.abc import MutableSequence
+from functools import partial
 
 from .api import API, FileToken
+from .metrics import _lazy_load
 
 
 class ResourceNotSynchronized(RuntimeError):
@@ -10,38 +12,78 @@ class ResourceNotSynchronized(RuntimeError):
 
 
 class _ResourceList(MutableSequence):
+    """
+    List view of a resource property. Items are decoded once and mutations are kept
+    locally until committed to the resource in one step, which happens on exiting the
+    view as a context manager, on the next read of the property, or on push/pull.
+    """
+
     def __init__(self, getter: Callable, parent_resource, property_name: str):
         super().__init__()
         self._getter = getter
         self._parent_resource = parent_resource
         self._property_name = property_name
+        self._items = None
+        self._raw = None
+        self._dirty = False
+
+    def _data(self) -> list:
+        if self._dirty:
+            return self._items
+        pending = self._parent_resource._pending_lists.get(self._property_name)
+        if pending is not None and pending is not self:
+            pending._commit()
+        raw = self._parent_resource._raw_value(self._property_name)
+        if self._items is None or raw is not self._raw:
+            self._items = self._getter()
+            self._raw = self._parent_resource._raw_value(self._property_name)
+        return self._items
+
+    def _mutated(self) -> None:
+        self._dirty = True
+        self._parent_resource._pending_lists[self._property_name] = self
+
+    def _commit(self) -> None:
+        if not self._dirty:
+            return
+        self._dirty = False
+        setattr(self._parent_resource, self._property_name, self._items)
+        # The setter may have normalized the values, so they are decoded again on next use
+        self._items = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args) -> None:
+        self._commit()
 
     def __getitem__(self, i):
-        d = self._getter()
-        return d[i]
+        return self._data()[i]
 
     def __setitem__(self, i, item) -> None:
-        d = self._getter()
-        d[i] = item
-        setattr(self._parent_resource, self._property_name, d)
+        self._data()[i] = item
+        self._mutated()
 
     def __delitem__(self, i) -> None:
-        d = self._getter()
-        del d[i]
-        setattr(self._parent_resource, self._property_name, d)
+        del self._data()[i]
+        self._mutated()
 
     def __len__(self) -> int:
-        d = self._getter()
-        return len(d)
+        return len(self._data())
+
+    def __iter__(self):
+        return iter(list(self._data()))
 
     def __str__(self) -> str:
-        d = self._getter()
-        return str(d)
+        return str(self._data())
 
     def insert(self, index: int, value) -> None:
-        d = self._getter()
-        d.insert(index, value)
-        setattr(self._parent_resource, self._property_name, d)
+        self._data().insert(index, value)
+        self._mutated()
+
+    def extend(self, values) -> None:
+        self._data().extend(values)
+        self._mutated()
 
 
 class Resource:
@@ -49,6 +91,9 @@ class Resource:
         self._api = api
         self._json = initial_json
         self._json_new = {}
+        self._hydration_group = None
+        self._decoded = {}
+        self._pending_lists = {}
 
     # Abstract methods to override
     def _get_instance_urlparts(self) -> List[str]:
@@ -65,12 +110,24 @@ class Resource:
         """Core lazy load fields generator for this class"""
         raise NotImplementedError()
 
-    def _setter_transforms(self) -> Dict[str, Callable]:
+    @classmethod
+    def _identity_field(cls) -> str:
+        """Field whose value(s) uniquely identify an instance of this class"""
+        return "id"
+
+    @classmethod
+    def _identity_query(cls, keys: List[Any]) -> str:
+        """Search query matching the instances identified by keys"""
+        return "id:" + ",".join(str(x) for x in keys)
+
+    @classmethod
+    def _setter_transforms(cls) -> Dict[str, Callable]:
         """Converts set value to JSON-serializable dictionary"""
         return {}
 
-    def _getter_transforms(self) -> Dict[str, Callable]:
-        """Converts internal JSON dictionary into usable value"""
+    @classmethod
+    def _getter_transforms(cls) -> Dict[str, Callable]:
+        """Converts internal JSON dictionary and API instance into usable value"""
         return {}
 
     def _serialized(self) -> Dict[str, Any]:
@@ -78,6 +135,38 @@ class Resource:
         return {}
 
     # Common methods
+    @classmethod
+    def _json_cache_keys(cls, data: Dict[str, Any]) -> List[Any]:
+        value = data.get(cls._identity_field())
+        if value is None:
+            return []
+        return list(value) if isinstance(value, list) else [value]
+
+    def _cache_keys(self) -> List[Any]:
+        return self._json_cache_keys(self._json)
+
+    @classmethod
+    def _from_cache(cls, api: API, data: Dict[str, Any]):
+        """Returns the cached instance identified by data, or caches a new one"""
+        keys = cls._json_cache_keys(data)
+        resource = api._resource_cache.get(cls, keys[0]) if keys else None
+        if resource is None:
+            resource = cls(api, data)
+            api._resource_cache.add(resource)
+        elif not resource._is_older(data):
+            # Server data replaces cached fields, except those with pending changes
+            old_keys = resource._cache_keys()
+            for key, value in data.items():
+                if key not in resource._json_new:
+                    resource._json[key] = value
+            api._resource_cache.add(resource, old_keys)
+        return resource
+
+    def _is_older(self, data: Dict[str, Any]) -> bool:
+        version = data.get("version")
+        current = self._json.get("version")
+        return version is not None and current is not None and version < current
+
     def _copy_new_json(self, keys_to_copy: List[str]):
         ret = {}
         for key in keys_to_copy:
@@ -85,36 +174,104 @@ class Resource:
                 ret[key] = self._json_new[key]
         return ret
 
+    def _check_synchronized(self, data: Dict[str, Any]):
+        for key in data:
+            if key not in self._json_new:
+                # property not changed
+                continue
+            if self._json.get(key) == self._json_new[key]:
+                # property set back to original
+                continue
+            if data[key] == self._json_new[key]:
+                # property set to new value
+                continue
+            raise ResourceNotSynchronized(key)
+
     def _update_json(self, data: Dict[str, Any], force: bool = False):
         if not force:
-            for key in data:
-                if key not in self._json_new:
-                    # property not changed
-                    continue
-                if self._json[key] == self._json_new[key]:
-                    # property set back to original
-                    continue
-                if data[key] == self._json_new[key]:
-                    # property set to new value
-                    continue
-                raise ResourceNotSynchronized(key)
+            self._check_synchronized(data)
+        old_keys = self._cache_keys()
         self._json_new = {}
         self._json = data
+        self._api._resource_cache.add(self, old_keys)
 
-    def pull(self) -> None:
-        data = self._api._call("GET", self._get_instance_urlparts())
-        self._update_json(data)
+    def _is_stale(self, data: Dict[str, Any]) -> bool:
+        return self._json.get("version") not in (None, data.get("version"))
 
-    def push(self) -> None:
+    def _merge_json(self, data: Dict[str, Any]):
+        """Merges a field-projected response into the internal JSON"""
+        self._check_synchronized(data)
+        old_keys = self._cache_keys()
+        if self._is_stale(data):
+            # Resource was changed on the server, previously fetched fields are outdated
+            self._json = data
+        else:
+            self._json = {**self._json, **data}
+        for key in data:
+            self._json_new.pop(key, None)
+        self._api._resource_cache.add(self, old_keys)
+
+    @classmethod
+    def _projection(cls, fields: List[str]) -> List[str]:
+        """Fields to request so that a partial response still identifies the resource"""
+        return list(dict.fromkeys([cls._identity_field(), "version", *fields]))
+
+    def _needs_full_pull(self, data: Dict[str, Any]) -> bool:
+        # Pending changes to fields outside a partial response can only be checked
+        # against the server by pulling the whole resource
+        return self._is_stale(data) and bool(set(self._json_new) - set(data))
+
+    def _raw_value(self, property_name: str) -> Any:
+        if property_name in self._json_new:
+            return self._json_new[property_name]
+        return self._json.get(property_name)
+
+    def _commit_lists(self) -> None:
+        """Writes back uncommitted changes made through list views"""
+        for view in list(self._pending_lists.values()):
+            view._commit()
+
+    def _create_reconciler(self) -> Optional[Callable[[], Optional[Dict[str, Any]]]]:
+        """
+        Function looking up this resource on the server after a create request failed
+        in a way that it may still have been applied, returning its JSON or None if it
+        was not created. None if resources of this class cannot be looked up that way.
+        """
+        return None
+
+    def _push_request(self) -> Tuple[str, List[str], Dict[str, Any]]:
+        self._commit_lists()
         body = self._serialized()
         if "version" in self._json and self._json["version"]:
             body["version"] = self._json["version"]
-            data = self._api._call("PUT", self._get_instance_urlparts(), body=body)
+            return "PUT", self._get_instance_urlparts(), body
+        else:
+            return "POST", self._get_class_urlparts(), body
+
+    def pull(self, fields: List[str] = None) -> None:
+        self._commit_lists()
+        if fields is None:
+            data = self._api._call("GET", self._get_instance_urlparts())
+            self._update_json(data)
+            return
+        data = self._api._call(
+            "GET",
+            self._get_instance_urlparts(),
+            urlquery={"fields": ",".join(self._projection(fields))},
+        )
+        if self._needs_full_pull(data):
+            self.pull()
         else:
-            data = self._api._call("POST", self._get_class_urlparts(), body=body)
+            self._merge_json(data)
+
+    def push(self) -> None:
+        method, urlparts, body = self._push_request()
+        reconcile = self._create_reconciler() if method == "POST" else None
+        data = self._api._call(method, urlparts, body=body, reconcile=reconcile)
         self._update_json(data, force=True)
 
     def synchronized(self) -> bool:
+        self._commit_lists()
         return bool(self._json_new)
 
     @property
@@ -122,48 +279,83 @@ class Resource:
         return self._api
 
     @classmethod
-    def _apply_transforms(
-        cls, transforms: Dict[str, Callable], property_name: str, property_value: Any
-    ) -> Any:
+    def _compiled_transforms(cls) -> Tuple[Dict[str, Callable], Dict[str, Callable]]:
+        """Getter and setter transforms of this class, built once per class"""
+        tables = cls.__dict__.get("_transform_tables")
+        if tables is None:
+            tables = (cls._getter_transforms(), cls._setter_transforms())
+            cls._transform_tables = tables
+        return tables
+
+    @classmethod
+    def _apply_transforms(cls, transform: Optional[Callable], property_value: Any) -> Any:
         if property_value is None:
             return None
         elif isinstance(property_value, list):
-            return [
-                cls._apply_transforms(transforms, property_name, x) for x in property_value
-            ]
-        elif property_name in transforms:
-            return transforms[property_name](property_value)
+            return [cls._apply_transforms(transform, x) for x in property_value]
+        elif transform is not None:
+            return transform(property_value)
         else:
             return property_value
 
+    @staticmethod
+    def _copy_lists(value: Any) -> Any:
+        # Decoded values are cached, so callers get their own copy of any list
+        if isinstance(value, list):
+            return [Resource._copy_lists(x) if isinstance(x, list) else x for x in value]
+        return value
+
     def _generic_getter(self, property_name: str, dynamic_refresh: bool = True) -> Any:
+        pending = self._pending_lists.get(property_name)
+        if pending is not None:
+            pending._commit()
         if property_name in self._json_new:
-            return self._apply_transforms(
-                self._getter_transforms(), property_name, self._json_new[property_name]
-            )
+            raw = self._json_new[property_name]
         elif property_name in self._json:
-            return self._apply_transforms(
-                self._getter_transforms(), property_name, self._json[property_name]
-            )
+            raw = self._json[property_name]
         elif dynamic_refresh:
-            self.pull()
+            with _lazy_load(self, property_name):
+                if self._hydration_group:
+                    _hydrate(self._api, self._hydration_group, [property_name])
+                if property_name not in self._json:
+                    self.pull([property_name])
             return self._generic_getter(property_name, False)
         else:
             raise KeyError(f"{property_name} is not present in the JSON response")
 
+        # Decoding is only redone once the underlying JSON value has been replaced
+        cached = self._decoded.get(property_name)
+        if cached is None or cached[0] is not raw:
+            transform = self._compiled_transforms()[0].get(property_name)
+            if transform is not None:
+                transform = partial(transform, self._api)
+            cached = (raw, self._apply_transforms(transform, raw))
+            self._decoded[property_name] = cached
+        return self._copy_lists(cached[1])
+
     def _generic_setter(
         self, property_name: str, property_value: Any, dynamic_refresh: bool = True
     ) -> None:
+        if isinstance(property_value, _ResourceList):
+            # Read a view assigned back (e.g. with its own edits) before it is reset
+            property_value = list(property_value)
+        # A view with uncommitted changes is superseded by the assignment, so later
+        # mutations through it start again from the assigned value
+        view = self._pending_lists.pop(property_name, None)
+        if view is not None:
+            view._dirty = False
+            view._items = None
         if property_name in self._json:
             if isinstance(self._json[property_name], list):
                 if not hasattr(property_value, "__iter__"):
                     raise ValueError(f"{property_name} must be an iterable")
                 property_value = list(property_value)
             self._json_new[property_name] = self._apply_transforms(
-                self._setter_transforms(), property_name, property_value
+                self._compiled_transforms()[1].get(property_name), property_value
             )
         elif dynamic_refresh:
-            self.pull()
+            with _lazy_load(self, property_name):
+                self.pull([property_name])
             self._generic_setter(property_name, property_value, False)
         else:
             raise KeyError(f"{property_name} is not present in the JSON response")
@@ -172,7 +364,8 @@ class Resource:
         if f"{property_name}Url" in self._json:
             return self._api._create_data_url(self._json[f"{property_name}Url"])
         elif dynamic_refresh:
-            self.pull()
+            with _lazy_load(self, property_name):
+                self.pull([f"{property_name}Url"])
             return self._file_getter(property_name, False)
         else:
             raise KeyError(f"{property_name} is not a URL resource in the JSON response")
@@ -181,3 +374,40 @@ class Resource:
         self, property_name: str, property_value: FileToken, dynamic_refresh: bool = False
     ) -> None:
         self._json_new[f"{property_name}Token"] = property_value.token
+
+
+def _hydrate(
+    api: API, resources: Iterable[Resource], fields: List[str], chunk_size: int = 100
+) -> None:
+    """
+    Fills in fields missing from resources with one search request per chunk_size
+    resources of the same class, instead of one pull() per resource
+    """
+    missing = {}
+    for resource in resources:
+        if any(field not in resource._json for field in fields):
+            missing.setdefault(type(resource), []).append(resource)
+    for cls, items in missing.items():
+        for i in range(0, len(items), chunk_size):
+            chunk = items[i : i + chunk_size]
+            page = api._call(
+                "GET",
+                cls._get_class_urlparts(),
+                urlquery={
+                    "query": cls._identity_query([r._cache_keys()[0] for r in chunk]),
+                    "limit": len(chunk),
+                    "fields": ",".join(cls._projection(fields)),
+                },
+            )
+            by_key = {}
+            for data in page["results"]:
+                for key in cls._json_cache_keys(data):
+                    by_key[str(key).lower()] = data
+            for resource in chunk:
+                data = by_key.get(str(resource._cache_keys()[0]).lower())
+                if data is None:
+                    continue
+                if resource._needs_full_pull(data):
+                    resource.pull()
+                else:
+                    resource._merge_json(data)
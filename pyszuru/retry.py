@@ -0,0 +1,107 @@
+from typing import Dict, Optional
+
+import random
+import threading
+
+import requests
+from urllib3.exceptions import NewConnectionError
+
+from .throttle import _OVERLOAD_STATUS_CODES, _retry_after
+
+
+def _not_processed(
+    error: Optional[Exception], response: Optional[requests.models.Response]
+) -> bool:
+    """Whether a failed attempt certainly did not reach the application on the server"""
+    if response is not None:
+        return response.status_code in _OVERLOAD_STATUS_CODES
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    if isinstance(error, requests.exceptions.ConnectionError) and error.args:
+        return isinstance(getattr(error.args[0], "reason", None), NewConnectionError)
+    return False
+
+
+class RetryPolicy:
+    """
+    How failed API requests are retried: up to max_attempts attempts, with exponentially
+    growing delays capped at max_backoff and randomized when jitter is set, and no retry
+    started after max_elapsed seconds. A Retry-After header from the server extends the
+    delay. Pass max_attempts=1 to disable retries.
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 4,
+        backoff: float = 0.5,
+        max_backoff: float = 30.0,
+        max_elapsed: float = 120.0,
+        jitter: bool = True,
+        status_codes: tuple = (429, 500, 502, 503, 504),
+    ):
+        if max_attempts < 1:
+            raise ValueError("max_attempts must be at least 1")
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_elapsed = max_elapsed
+        self.jitter = jitter
+        self.status_codes = status_codes
+
+    def _delay(self, attempt: int, response: Optional[requests.models.Response]) -> float:
+        delay = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+        if self.jitter:
+            delay = random.uniform(0, delay)
+        if response is not None:
+            delay = max(delay, _retry_after(response) or 0)
+        return delay
+
+
+class RetryStats:
+    """
+    Counters of requests made through an API instance: attempts and retries, requests
+    that were given up or reconciled with the server state, and latency including retries
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.attempts = 0
+        self.retries = 0
+        self.reconciled = 0
+        self.gave_up = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self.retries_by_endpoint: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _record(
+        self,
+        endpoint: str,
+        attempts: int,
+        latency: float,
+        reconciled: bool = False,
+        gave_up: bool = False,
+    ) -> None:
+        with self._lock:
+            self.requests += 1
+            self.attempts += attempts
+            self.retries += attempts - 1
+            if attempts > 1:
+                self.retries_by_endpoint[endpoint] = (
+                    self.retries_by_endpoint.get(endpoint, 0) + attempts - 1
+                )
+            self.reconciled += reconciled
+            self.gave_up += gave_up
+            self.total_latency += latency
+            self.max_latency = max(self.max_latency, latency)
+
+    @property
+    def mean_latency(self) -> float:
+        return self.total_latency / self.requests if self.requests else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.requests} requests, {self.retries} retries, {self.reconciled} "
+            f"reconciled, {self.gave_up} given up, mean latency "
+            f"{self.mean_latency * 1000:.1f}ms, max {self.max_latency * 1000:.1f}ms"
+        )
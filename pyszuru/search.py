@@ -1,12 +1,15 @@
-from typing import Generator, List
+from typing import Any, AsyncGenerator, Dict, Generator, List
 
 import warnings
-from collections import namedtuple
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 
 from tqdm import tqdm
 
 from .api import API, FileToken
 from .post import Post
+from .record import _record_classes
 from .resource import Resource
 from .tag import Tag
 
@@ -25,6 +28,50 @@ class _NullContextManager(object):
         pass
 
 
+def _page_query(
+    search_query: str,
+    transforming_class: type,
+    offset: int,
+    page_size: int,
+    eager_load: bool,
+    fields: List[str] = None,
+) -> Dict[str, Any]:
+    urlquery = {"offset": offset, "limit": page_size, "query": search_query}
+    if fields:
+        urlquery["fields"] = ",".join(transforming_class._projection(fields))
+    elif not eager_load:
+        urlquery["fields"] = ",".join(transforming_class._lazy_load_components())
+    return urlquery
+
+
+def _check_compact_fields(transforming_class: type, fields: List[str]) -> None:
+    # Records only have slots for the fields returned by a search by default
+    extra = set(fields or ()) - set(transforming_class._lazy_load_components())
+    if extra:
+        raise ValueError(
+            "Compact results cannot hold the fields " + ", ".join(sorted(extra))
+        )
+
+
+def _page_resources(
+    api: API,
+    transforming_class: type,
+    page: Dict[str, Any],
+    batch_hydrate: bool,
+    records: Dict = None,
+) -> List[Resource]:
+    if records is not None:
+        # Compact read-only records, sharing tag records through the `records` table
+        record_class = _record_classes[transforming_class]
+        return [record_class._from_json(api, item, records) for item in page["results"]]
+    resources = [transforming_class(api, item) for item in page["results"]]
+    if batch_hydrate:
+        # Lazily loaded fields are then fetched for the whole page at once
+        for resource in resources:
+            resource._hydration_group = resources
+    return resources
+
+
 def _search_generic(
     api: API,
     search_query: str,
@@ -32,18 +79,187 @@ def _search_generic(
     page_size: int,
     show_progress_bar: bool = False,
     eager_load: bool = False,
+    prefetch: int = 0,
+    workers: int = 1,
+    fields: List[str] = None,
+    batch_hydrate: bool = False,
+    compact: bool = False,
 ) -> Generator[Resource, None, None]:
+    if compact:
+        _check_compact_fields(transforming_class, fields)
+    if prefetch > 0:
+        yield from _search_prefetched(
+            api,
+            search_query,
+            transforming_class,
+            page_size,
+            show_progress_bar,
+            eager_load,
+            prefetch,
+            workers,
+            fields,
+            batch_hydrate,
+            compact,
+        )
+        return
+    records = {} if compact else None
     offset = 0
     total = None
     with tqdm() if show_progress_bar else _NullContextManager() as pbar:
         while True:
-            urlquery = {"offset": offset, "limit": page_size, "query": search_query}
-            if not eager_load:
-                urlquery["fields"] = ",".join(transforming_class._lazy_load_components())
             page = api._call(
                 "GET",
                 transforming_class._get_class_urlparts(),
-                urlquery=urlquery,
+                urlquery=_page_query(
+                    search_query, transforming_class, offset, page_size, eager_load, fields
+                ),
+            )
+            offset = offset + len(page["results"])
+            if page["total"] != total:
+                total = page["total"]
+                if show_progress_bar:
+                    pbar.total = total
+                    pbar.refresh()
+            for resource in _page_resources(
+                api, transforming_class, page, batch_hydrate, records
+            ):
+                if show_progress_bar:
+                    pbar.update()
+                yield resource
+            if offset >= total:
+                break
+
+
+def _search_prefetched(
+    api: API,
+    search_query: str,
+    transforming_class: type,
+    page_size: int,
+    show_progress_bar: bool,
+    eager_load: bool,
+    prefetch: int,
+    workers: int,
+    fields: List[str] = None,
+    batch_hydrate: bool = False,
+    compact: bool = False,
+) -> Generator[Resource, None, None]:
+    def fetch(offset: int) -> Dict[str, Any]:
+        return api._call(
+            "GET",
+            transforming_class._get_class_urlparts(),
+            urlquery=_page_query(
+                search_query, transforming_class, offset, page_size, eager_load, fields
+            ),
+        )
+
+    # The first page gives the total and the page length the server actually honours,
+    # after which the remaining pages are independent and can be fetched in parallel.
+    # At most `prefetch` pages are held in memory at any time.
+    records = {} if compact else None
+    page = fetch(0)
+    total = page["total"]
+    stride = len(page["results"])
+    offsets = iter(range(stride, total, stride) if stride else ())
+    pending = deque()
+    with tqdm(total=total) if show_progress_bar else _NullContextManager() as pbar:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            try:
+                while True:
+                    for offset in islice(offsets, prefetch - len(pending)):
+                        pending.append(executor.submit(fetch, offset))
+                    for resource in _page_resources(
+                        api, transforming_class, page, batch_hydrate, records
+                    ):
+                        if show_progress_bar:
+                            pbar.update()
+                        yield resource
+                    if not pending:
+                        break
+                    page = pending.popleft().result()
+            finally:
+                for future in pending:
+                    future.cancel()
+
+
+def _search_keyset(
+    api: API,
+    search_query: str,
+    transforming_class: type,
+    page_size: int,
+    show_progress_bar: bool = False,
+    eager_load: bool = False,
+    cursor: int = None,
+    ascending: bool = False,
+    fields: List[str] = None,
+    batch_hydrate: bool = False,
+    compact: bool = False,
+) -> Generator[Resource, None, None]:
+    """
+    Pages through results ordered by id, starting each page after the last id seen
+    (or after `cursor` to resume a scan), so that page cost stays flat and resources
+    created or deleted mid-scan never cause repeated or skipped results.
+    """
+    if "sort:" in search_query:
+        raise ValueError("Keyset pagination cannot be combined with a sort: token")
+    if compact:
+        _check_compact_fields(transforming_class, fields)
+    sort_token = "-sort:id" if ascending else "sort:id"
+    bound_token = "id-min:{}" if ascending else "id-max:{}"
+    step = 1 if ascending else -1
+    records = {} if compact else None
+    total = None
+    with tqdm() if show_progress_bar else _NullContextManager() as pbar:
+        while True:
+            query = [search_query, sort_token]
+            if cursor is not None:
+                query.append(bound_token.format(cursor + step))
+            page = api._call(
+                "GET",
+                transforming_class._get_class_urlparts(),
+                urlquery=_page_query(
+                    " ".join(query).strip(),
+                    transforming_class,
+                    0,
+                    page_size,
+                    eager_load,
+                    fields,
+                ),
+            )
+            if total is None:
+                total = page["total"]
+                if show_progress_bar:
+                    pbar.total = total
+                    pbar.refresh()
+            for resource in _page_resources(
+                api, transforming_class, page, batch_hydrate, records
+            ):
+                if show_progress_bar:
+                    pbar.update()
+                cursor = resource.id_ if compact else resource._json["id"]
+                yield resource
+            if len(page["results"]) >= page["total"]:
+                break
+
+
+async def _search_generic_async(
+    api,  # api: AsyncAPI
+    search_query: str,
+    transforming_class: type,
+    page_size: int,
+    show_progress_bar: bool = False,
+    eager_load: bool = False,
+    fields: List[str] = None,
+) -> AsyncGenerator[Resource, None]:
+    offset = 0
+    total = None
+    with tqdm() if show_progress_bar else _NullContextManager() as pbar:
+        while True:
+            page = await api._call_async(
+                "GET",
+                transforming_class._get_class_urlparts(),
+                urlquery=_page_query(
+                    search_query, transforming_class, offset, page_size, eager_load, fields
+                ),
             )
             offset = offset + len(page["results"])
             if page["total"] != total:
@@ -54,7 +270,7 @@ def _search_generic(
             for item in page["results"]:
                 if show_progress_bar:
                     pbar.update()
-                yield transforming_class(api, item)
+                yield transforming_class(api.api, item)
             if offset >= total:
                 break
 
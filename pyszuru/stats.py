@@ -0,0 +1,47 @@
+import threading
+import time
+
+
+class TransferStats:
+    _verb = "transferred"
+
+    def __init__(self):
+        self.files = 0
+        self.bytes = 0
+        self.skipped = 0
+        self.errors = []
+        self._start = time.monotonic()
+        self._end = None
+        self._lock = threading.Lock()
+
+    def _record(self, size: int, skipped: bool = False, error: Exception = None, item=None):
+        with self._lock:
+            if error is not None:
+                self.errors.append((item, error))
+            elif skipped:
+                self.skipped += 1
+            else:
+                self.files += 1
+                self.bytes += size
+
+    def _finish(self) -> None:
+        self._end = time.monotonic()
+
+    @property
+    def elapsed(self) -> float:
+        return (self._end or time.monotonic()) - self._start
+
+    @property
+    def files_per_second(self) -> float:
+        return self.files / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def megabytes_per_second(self) -> float:
+        return self.bytes / 1e6 / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.files} files {self._verb}, {self.skipped} skipped, "
+            f"{len(self.errors)} failed in {self.elapsed:.1f}s "
+            f"({self.files_per_second:.1f} files/s, {self.megabytes_per_second:.2f} MB/s)"
+        )
@@ -0,0 +1,215 @@
+from typing import Any, Dict, Generator, Iterable, List, Optional, Tuple
+
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+from .api import API
+from .pool import Pool
+from .post import Post
+from .resource import Resource
+from .search import _search_generic
+from .tag import Tag
+
+
+class LocalStore:
+    """
+    SQLite-backed local copy of posts, tags and pools. refresh() downloads resources
+    matching a query, only fetching those created or edited since the previous refresh,
+    and lookups are then answered locally with resources backed by the stored JSON.
+    Deletions on the server are not detected by refresh(); see ChangeFeed for that.
+    """
+
+    _kinds = {Post: "post", Tag: "tag", Pool: "pool"}
+
+    def __init__(self, api: API, path: str = ":memory:"):
+        self._api = api
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._db:
+            self._db.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS resources (
+                    kind TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    version INTEGER,
+                    json TEXT NOT NULL,
+                    PRIMARY KEY (kind, key)
+                );
+                CREATE TABLE IF NOT EXISTS post_tags (
+                    post_id INTEGER NOT NULL,
+                    tag TEXT NOT NULL,
+                    PRIMARY KEY (post_id, tag)
+                );
+                CREATE INDEX IF NOT EXISTS post_tags_tag ON post_tags (tag);
+                CREATE TABLE IF NOT EXISTS meta (
+                    name TEXT PRIMARY KEY,
+                    value TEXT
+                );
+                """
+            )
+
+    def close(self) -> None:
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    # Metadata
+    def _get_meta(self, name: str) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value FROM meta WHERE name = ?", (name,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, name: str, value: str) -> None:
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)", (name, value)
+            )
+
+    # Writing
+    @classmethod
+    def _key(cls, resource_class: type, data: Dict[str, Any]) -> str:
+        return str(resource_class._json_cache_keys(data)[0])
+
+    def _put_many(self, resource_class: type, items: Iterable[Dict[str, Any]]) -> int:
+        kind = self._kinds[resource_class]
+        count = 0
+        with self._lock, self._db:
+            for data in items:
+                key = self._key(resource_class, data)
+                self._db.execute(
+                    "INSERT OR REPLACE INTO resources (kind, key, version, json) "
+                    "VALUES (?, ?, ?, ?)",
+                    (
+                        kind,
+                        key,
+                        data.get("version"),
+                        self._api.json_codec.dumps(data).decode("utf-8"),
+                    ),
+                )
+                if resource_class is Post and "tags" in data:
+                    self._db.execute("DELETE FROM post_tags WHERE post_id = ?", (key,))
+                    self._db.executemany(
+                        "INSERT OR IGNORE INTO post_tags (post_id, tag) VALUES (?, ?)",
+                        [(data["id"], t["names"][0]) for t in data["tags"]],
+                    )
+                count += 1
+        return count
+
+    def put(self, resource: Resource) -> None:
+        self._put_many(type(resource), [resource._json])
+
+    def delete(self, resource_class: type, key: Any) -> None:
+        with self._lock, self._db:
+            self._db.execute(
+                "DELETE FROM resources WHERE kind = ? AND key = ?",
+                (self._kinds[resource_class], str(key)),
+            )
+            if resource_class is Post:
+                self._db.execute("DELETE FROM post_tags WHERE post_id = ?", (str(key),))
+
+    def refresh(
+        self,
+        resource_class: type,
+        search_query: str = "",
+        page_size: int = 100,
+        show_progress_bar: bool = False,
+    ) -> int:
+        """
+        Stores every resource matching search_query, or on later calls with the same
+        query, only those created or edited since the previous refresh. Returns the
+        number of distinct resources stored.
+        """
+        watermark_name = f"refresh:{self._kinds[resource_class]}:{search_query}"
+        watermark = self._get_meta(watermark_name)
+        started = datetime.now(timezone.utc)
+        if watermark is None:
+            queries = [search_query]
+        else:
+            # Date filters have day granularity, so resources edited on the watermark
+            # day are fetched again, which is harmless.
+            since = watermark[:10]
+            queries = [
+                f"{search_query} creation-date:{since}..".strip(),
+                f"{search_query} last-edit-date:{since}..".strip(),
+            ]
+        # Resources created and edited since the watermark match both queries, and are
+        # only stored once
+        stored = set()
+
+        def unseen(results) -> Generator[Dict[str, Any], None, None]:
+            for resource in results:
+                key = self._key(resource_class, resource._json)
+                if key not in stored:
+                    stored.add(key)
+                    yield resource._json
+
+        for query in queries:
+            results = _search_generic(
+                self._api,
+                query,
+                resource_class,
+                page_size,
+                show_progress_bar,
+                eager_load=True,
+            )
+            self._put_many(resource_class, unseen(results))
+        self._set_meta(watermark_name, started.isoformat())
+        return len(stored)
+
+    # Reading
+    def _rows(self, sql: str, params: Tuple = ()) -> List[Tuple]:
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+    def get(self, resource_class: type, key: Any) -> Optional[Resource]:
+        rows = self._rows(
+            "SELECT json FROM resources WHERE kind = ? AND key = ?",
+            (self._kinds[resource_class], str(key)),
+        )
+        return (
+            resource_class(self._api, self._api.json_codec.loads(rows[0][0]))
+            if rows
+            else None
+        )
+
+    def all(self, resource_class: type) -> Generator[Resource, None, None]:
+        for (data,) in self._rows(
+            "SELECT json FROM resources WHERE kind = ?", (self._kinds[resource_class],)
+        ):
+            yield resource_class(self._api, self._api.json_codec.loads(data))
+
+    def count(self, resource_class: type) -> int:
+        return self._rows(
+            "SELECT COUNT(*) FROM resources WHERE kind = ?", (self._kinds[resource_class],)
+        )[0][0]
+
+    def posts_with_tags(
+        self, tags: List[str], safety: str = None
+    ) -> Generator[Post, None, None]:
+        """Posts tagged with all of the given (primary) tag names"""
+        sql = (
+            "SELECT r.json FROM post_tags pt "
+            "JOIN resources r ON r.kind = 'post' AND r.key = CAST(pt.post_id AS TEXT) "
+            f"WHERE pt.tag IN ({','.join('?' * len(tags))}) "
+            "GROUP BY pt.post_id HAVING COUNT(*) = ? ORDER BY pt.post_id DESC"
+        )
+        for (data,) in self._rows(sql, (*tags, len(set(tags)))):
+            post = Post(self._api, self._api.json_codec.loads(data))
+            if safety is None or post._json.get("safety") == safety:
+                yield post
+
+    def cooccurring_tags(self, tag: str, limit: int = 20) -> List[Tuple[str, int]]:
+        """Tags most often found on posts tagged with tag, with their post counts"""
+        return self._rows(
+            "SELECT other.tag, COUNT(*) AS n FROM post_tags pt "
+            "JOIN post_tags other ON other.post_id = pt.post_id AND other.tag != pt.tag "
+            "WHERE pt.tag = ? GROUP BY other.tag ORDER BY n DESC, other.tag LIMIT ?",
+            (tag, limit),
+        )
@@ -1,5 +1,8 @@
-from typing import Any, Callable, Dict, List
+from typing import Any, Callable, Dict, List, Optional
 
+import re
+
+from .api import API, SzurubooruHTTPError
 from .resource import Resource, ResourceNotSynchronized, _ResourceList
 
 
@@ -16,16 +19,84 @@ class Tag(Resource):
     def _lazy_load_components(cls) -> List[str]:
         return ["names", "category", "usages"]
 
-    def _setter_transforms(self) -> Dict[str, Callable]:
+    @classmethod
+    def _identity_field(cls) -> str:
+        return "names"
+
+    @classmethod
+    def _identity_query(cls, keys: List[str]) -> str:
+        return ",".join(cls._escape_name(x) for x in keys)
+
+    @staticmethod
+    def _escape_name(name: str) -> str:
+        escaped = re.sub(r"([\\,*:])", r"\\\1", name)
+        return f"\\{escaped}" if escaped.startswith("-") else escaped
+
+    @classmethod
+    def _resolve_names(cls, api: API, names: List[str], chunk_size: int = 50) -> Dict:
+        """
+        Resolves tag names to tags, using the API's resource cache and looking up the
+        remaining names with one search request per chunk_size names
+        """
+        resolved = {}
+        missing = []
+        for name in names:
+            if name in resolved or name in missing:
+                continue
+            t = api._resource_cache.get(cls, name)
+            if t is None:
+                missing.append(name)
+            else:
+                resolved[name] = t
+        for i in range(0, len(missing), chunk_size):
+            chunk = {x.lower(): x for x in missing[i : i + chunk_size]}
+            page = api._call(
+                "GET",
+                cls._get_class_urlparts(),
+                urlquery={
+                    "query": cls._identity_query(list(chunk.values())),
+                    "limit": len(chunk),
+                    "fields": ",".join(cls._lazy_load_components()),
+                },
+            )
+            for item in page["results"]:
+                t = cls._from_cache(api, item)
+                for name in item["names"]:
+                    if name.lower() in chunk:
+                        resolved[chunk[name.lower()]] = t
+        for name in missing:
+            if name not in resolved:
+                # Not found by search, let a direct lookup raise the appropriate error
+                t = cls(api, {"names": [name]})
+                t.pull()
+                resolved[name] = t
+        return resolved
+
+    @classmethod
+    def _from_names(cls, api: API, values: List) -> List:  # values: List[Union[Tag, str]]
+        """Converts a list of tags and tag names into a list of tags"""
+        names = [x for x in values if isinstance(x, str)]
+        if not names:
+            return list(values)
+        if api.resolve_tag_names:
+            resolved = cls._resolve_names(api, names)
+        else:
+            # Names are all that is serialized, so skip looking up the category
+            resolved = {x: cls(api, {"names": [x], "category": None}) for x in names}
+        return [resolved[x] if isinstance(x, str) else x for x in values]
+
+    @classmethod
+    def _setter_transforms(cls) -> Dict[str, Callable]:
         return {
-            "implications": lambda x: {"names": x.names, "category": x.category},
-            "suggestions": lambda x: {"names": x.names, "category": x.category},
+            "implications": lambda x: {"names": list(x.names), "category": x.category},
+            "suggestions": lambda x: {"names": list(x.names), "category": x.category},
         }
 
-    def _getter_transforms(self) -> Dict[str, Callable]:
+    @classmethod
+    def _getter_transforms(cls) -> Dict[str, Callable]:
         return {
-            "implications": lambda x: Tag(self._api, x),
-            "suggestions": lambda x: Tag(self._api, x),
+            "implications": Tag._from_cache,
+            "suggestions": Tag._from_cache,
         }
 
     def _serialized(self) -> Dict[str, Any]:
@@ -38,10 +109,27 @@ class Tag(Resource):
             ret["suggestions"] = [x["names"][0] for x in ret["suggestions"]]
         return ret
 
+    def _create_reconciler(self) -> Optional[Callable[[], Optional[Dict[str, Any]]]]:
+        names = self._json_new.get("names")
+        if not names:
+            return None
+
+        def find() -> Optional[Dict[str, Any]]:
+            try:
+                return self._api._call("GET", ["tag", names[0]], use_cache=False)
+            except SzurubooruHTTPError as e:
+                if e.response is not None and e.response.status_code == 404:
+                    return None
+                raise
+
+        return find
+
     def merge_from(self, source, add_as_alias: bool) -> None:  # source: Tag
         """
         Merges source tag into this tag
         """
+        source._commit_lists()
+        self._commit_lists()
         if "version" not in source._json or source._json_new:
             raise ResourceNotSynchronized("Target tag is not synchronized")
         if "version" not in self._json or self._json_new:
@@ -62,6 +150,7 @@ class Tag(Resource):
             n.extend([x for x in source._json["names"] if x not in n])
             self.names = n
             self.push()
+        self._api._resource_cache.discard(source)
         source._json = {}
 
     # Getters and Setters
@@ -83,7 +172,7 @@ class Tag(Resource):
 
     @category.setter
     def category(self, val: str) -> None:
-        self._generic_setter("category", val)
+        self._generic_setter("category", self._api.tag_categories.validate(val))
 
     @property
     def implications(self):  # -> List[Tag]
@@ -94,8 +183,8 @@ class Tag(Resource):
         )
 
     @implications.setter
-    def implications(self, val: List) -> None:  # val: List[Tag]
-        self._generic_setter("implications", val)
+    def implications(self, val: List) -> None:  # val: List[Union[Tag, str]]
+        self._generic_setter("implications", self._from_names(self._api, val))
 
     @property
     def suggestions(self):  # -> List[Tag]
@@ -106,8 +195,8 @@ class Tag(Resource):
         )
 
     @suggestions.setter
-    def suggestions(self, val: List) -> None:  # val: List[Tag]
-        self._generic_setter("suggestions", val)
+    def suggestions(self, val: List) -> None:  # val: List[Union[Tag, str]]
+        self._generic_setter("suggestions", self._from_names(self._api, val))
 
     @property
     def description(self) -> str:
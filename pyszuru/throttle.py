@@ -0,0 +1,153 @@
+from typing import Dict, Optional, Tuple, Union
+
+import threading
+import time
+
+import requests
+
+_OVERLOAD_STATUS_CODES = (429, 503)
+
+
+def _retry_after(response: requests.models.Response) -> Optional[float]:
+    """Delay requested by the server in a Retry-After header, if given in seconds"""
+    value = response.headers.get("Retry-After", "").strip()
+    return float(value) if value.isdigit() else None
+
+
+class TokenBucket:
+    """
+    Allows rate requests per second on average, and bursts of up to burst requests
+    """
+
+    def __init__(self, rate: float, burst: float = None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.burst = burst or max(1.0, rate)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        # Tokens may go negative; the debt is how long the caller has to wait
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return max(0.0, -self._tokens / self.rate)
+
+    def acquire(self) -> None:
+        delay = self._reserve()
+        if delay:
+            time.sleep(delay)
+
+    def pause(self, seconds: float) -> None:
+        """Hands out no tokens for the given number of seconds"""
+        with self._lock:
+            self._tokens = min(self._tokens, -seconds * self.rate)
+            self._updated = time.monotonic()
+
+
+class RateLimiter:
+    """
+    Rate limits for API requests: an overall budget and separate budgets per endpoint,
+    keyed by the first part of the URL path (e.g. "posts", "post", "uploads", or "data"
+    for content downloads). Budgets are given as a rate or a (rate, burst) tuple.
+    Any object with the same acquire() and backoff() methods can be passed to API.
+    """
+
+    def __init__(
+        self,
+        rate: float = None,
+        burst: float = None,
+        endpoints: Dict[str, Union[float, Tuple[float, float]]] = None,
+    ):
+        self._overall = TokenBucket(rate, burst) if rate else None
+        self._endpoints = {
+            name: TokenBucket(*budget) if isinstance(budget, tuple) else TokenBucket(budget)
+            for name, budget in (endpoints or {}).items()
+        }
+
+    def _buckets(self, endpoint: str):
+        if endpoint in self._endpoints:
+            yield self._endpoints[endpoint]
+        if self._overall:
+            yield self._overall
+
+    def acquire(self, endpoint: str) -> None:
+        for bucket in self._buckets(endpoint):
+            bucket.acquire()
+
+    def backoff(self, endpoint: str, seconds: float) -> None:
+        """Called when the server asks to retry endpoint after the given delay"""
+        for bucket in self._buckets(endpoint):
+            bucket.pause(seconds)
+
+
+class AdaptiveConcurrency:
+    """
+    Limits the number of requests in flight with additive increase, multiplicative
+    decrease: the limit grows by one for every limit successful requests, and is
+    multiplied by decrease_ratio when the server answers 429/503, a request fails to
+    connect, or smoothed latency exceeds latency_tolerance times the lowest seen.
+    """
+
+    def __init__(
+        self,
+        initial: int = 4,
+        minimum: int = 1,
+        maximum: int = 64,
+        decrease_ratio: float = 0.5,
+        latency_tolerance: float = 3.0,
+    ):
+        if not 1 <= minimum <= initial <= maximum:
+            raise ValueError("Expected 1 <= minimum <= initial <= maximum")
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease_ratio = decrease_ratio
+        self.latency_tolerance = latency_tolerance
+        self._limit = float(initial)
+        self._in_flight = 0
+        self._min_latency = None
+        self._smoothed_latency = None
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def acquire(self) -> None:
+        with self._condition:
+            while self._in_flight >= int(self._limit):
+                self._condition.wait()
+            self._in_flight += 1
+
+    def release(self, latency: float, overloaded: bool = False) -> None:
+        with self._condition:
+            self._in_flight -= 1
+            if not overloaded:
+                if self._min_latency is None or latency < self._min_latency:
+                    self._min_latency = latency
+                if self._smoothed_latency is None:
+                    self._smoothed_latency = latency
+                else:
+                    self._smoothed_latency += 0.2 * (latency - self._smoothed_latency)
+            congested = overloaded or (
+                self._smoothed_latency > self._min_latency * self.latency_tolerance
+            )
+            now = time.monotonic()
+            if congested:
+                # Requests that were already in flight report the same congestion, so
+                # only decrease once per round trip
+                if now - self._last_decrease > (self._smoothed_latency or 0):
+                    self._limit = max(self.minimum, self._limit * self.decrease_ratio)
+                    self._last_decrease = now
+            else:
+                self._limit = min(self.maximum, self._limit + 1 / self._limit)
+            self._condition.notify_all()
@@ -40,6 +40,7 @@ setuptools.setup(
         "Operating System :: OS Independent",
     ],
     install_requires=requirements,
+    extras_require={"fast": ["orjson"]},
     python_requires=">=3.8",
     keywords=[
         "szurubooru",
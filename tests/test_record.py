@@ -0,0 +1,19 @@
+import pytest
+
+import pyszuru
+
+
+def test_records_are_read_only():
+    api = pyszuru.API("http://booru.test")
+    data = {
+        "id": 1,
+        "safety": "safe",
+        "type": "image",
+        "tags": [{"names": ["tag_1"], "category": "default", "usages": 1}],
+    }
+    record = pyszuru.PostRecord._from_json(api, data, {})
+    with pytest.raises(AttributeError):
+        record.safety = "unsafe"
+    with pytest.raises(AttributeError):
+        record.tags[0].category = "meta"
+    assert record.to_resource().safety == "safe"
@@ -0,0 +1,58 @@
+import pyszuru
+
+
+def _post(api: pyszuru.API) -> pyszuru.Post:
+    tags = [{"names": [f"tag_{i}"], "category": "default"} for i in (1, 2)]
+    return pyszuru.Post(api, {"id": 1, "version": 1, "tags": tags})
+
+
+def _tag_names(post: pyszuru.Post) -> list:
+    return [tag.primary_name for tag in post.tags]
+
+
+def test_assignment_supersedes_pending_list_view():
+    api = pyszuru.API("http://booru.test", resolve_tag_names=False)
+    post = _post(api)
+    view = post.tags
+    view.append("tag_0")
+    post.tags = ["tag_3"]
+    view.append("tag_4")
+    assert _tag_names(post) == ["tag_3", "tag_4"]
+
+
+def test_list_view_changes_are_committed_on_read():
+    api = pyszuru.API("http://booru.test", resolve_tag_names=False)
+    post = _post(api)
+    with post.tags as tags:
+        tags.append("tag_3")
+        del tags[0]
+    assert _tag_names(post) == ["tag_2", "tag_3"]
+
+
+def test_cached_resource_takes_newer_server_data():
+    api = pyszuru.API("http://booru.test")
+    tag = pyszuru.Tag._from_cache(api, {"names": ["tag_1"], "category": "default"})
+    tag._json_new["description"] = "local"
+    data = {"names": ["tag_1"], "category": "character", "description": "remote"}
+    assert pyszuru.Tag._from_cache(api, data) is tag
+    assert tag.category == "character"
+    assert tag.description == "local"
+
+
+def test_mutated_view_can_be_assigned_back():
+    api = pyszuru.API("http://booru.test")
+    tag = pyszuru.Tag(api, {"names": ["tag_1"], "version": 1})
+    names = tag.names
+    names.append("alias")
+    tag.names = names
+    assert list(tag.names) == ["tag_1", "alias"]
+    assert tag._serialized() == {"names": ["tag_1", "alias"]}
+
+
+def test_primary_name_setter():
+    api = pyszuru.API("http://booru.test")
+    tag = pyszuru.Tag(api, {"names": ["tag_1", "alias"], "version": 1})
+    tag.primary_name = "renamed"
+    assert list(tag.names) == ["renamed", "tag_1", "alias"]
+    tag.primary_name = "alias"
+    assert list(tag.names) == ["alias", "renamed", "tag_1"]